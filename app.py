@@ -9,6 +9,10 @@ Optimized for Intel Arc GPU with IPEX-LLM
 import os
 os.environ['BIGDL_IMPORT_IPEX'] = 'False'
 
+# Intel XPU runtime tuning - must be set before the SYCL runtime initializes
+os.environ.setdefault('ENABLE_SDP_FUSION', '1')  # Fused scaled-dot-product attention kernels
+os.environ.setdefault('SYCL_PI_LEVEL_ZERO_USE_IMMEDIATE_COMMANDLISTS', '1')  # Lower kernel submit latency
+
 from apiflask import APIFlask
 from flask import render_template, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
@@ -38,6 +42,9 @@ logging.basicConfig(
     ]
 )
 
+# Route warnings through the handlers above instead of raw stderr
+logging.captureWarnings(True)
+
 logger = logging.getLogger(__name__)
 
 # Initialize APIFlask (AI Playground pattern)
@@ -107,10 +114,10 @@ def initialize_model(model_name="gptoss"):
             display_name = "Llama 3.1 8B"
             
         elif model_name == "mistral":
-            from models.mistral_model import MistralModel
-            logger.info("Model: Mistral 7B Instruct v0.3 (Direct Response with Vulkan)")
+            from models.base_model import ModelFactory
+            logger.info(f"Model: Mistral 7B Instruct (Direct Response with {Config.MISTRAL_BACKEND})")
             logger.info("Loading Mistral 7B model...")
-            active_model = MistralModel(config={})
+            active_model = ModelFactory.create_model("mistral-7b", backend=Config.MISTRAL_BACKEND, config={})
             model_info = active_model.load_model()
             logger.info(f"✅ Mistral 7B loaded: {model_info}")
             display_name = "Mistral 7B"
@@ -123,6 +130,7 @@ def initialize_model(model_name="gptoss"):
         answer_evaluator.mistral_model = active_model  # For evaluation
         logger.info(f"✅ Answer evaluator connected to {display_name}")
         logger.info(f"   - Unified model for chat and evaluation")
+        answer_evaluator.prime_hint_prefix()
         
         model_status['status'] = 'ready'
         model_status['device'] = device_info
@@ -286,9 +294,7 @@ def chat():
         })
         
     except Exception as e:
-        logger.error(f"Chat error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Chat error: {e}")
         return jsonify({
             "code": -1,
             "message": str(e)
@@ -313,7 +319,16 @@ def chat_stream():
                 # Start generation
                 yield f"data: {json.dumps({'status': 'started', 'message': 'Generating response...'})}\n\n"
                 
-                # Generate response (if your model supports streaming)
+                # Stream tokens as they're decoded if the model supports it natively
+                if hasattr(active_model, 'stream_response'):
+                    chunks = []
+                    for chunk in active_model.stream_response(user_message):
+                        chunks.append(chunk)
+                        yield f"data: {json.dumps({'status': 'generating', 'chunk': chunk})}\n\n"
+                    yield f"data: {json.dumps({'status': 'completed', 'full_response': ''.join(chunks).strip()})}\n\n"
+                    return
+                
+                # Generate response
                 response = active_model.generate_response(user_message)
                 
                 # Send chunks (simulate streaming if model doesn't support it natively)
@@ -632,9 +647,7 @@ def lesson_doubt_chat():
         })
         
     except Exception as e:
-        logger.error(f"Doubt chat error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Doubt chat error: {e}")
         return jsonify({
             "code": -1,
             "message": str(e)
@@ -702,9 +715,7 @@ def evaluate_answer():
         })
         
     except Exception as e:
-        logger.error(f"Answer evaluation error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Answer evaluation error: {e}")
         return jsonify({
             "code": -1,
             "message": str(e)
@@ -925,6 +936,37 @@ def record_answer_progress():
         logger.error(f"Record answer error: {e}")
         return jsonify({"code": -1, "message": str(e)}), 500
 
+@app.post("/api/progress/record-answers-bulk")
+def record_answers_bulk_progress():
+    """Record several answers for one lesson in a single request"""
+    try:
+        data = request.get_json()
+        user_id = data.get('user_id', request.remote_addr)
+        grade = data.get('grade')
+        subject = data.get('subject')
+        lesson_id = data.get('lesson_id')
+        answers = data.get('answers')
+        
+        if not all([grade, subject, lesson_id, answers]) or not isinstance(answers, list) \
+                or not all(isinstance(answer, dict) and answer.get('question_id') for answer in answers):
+            return jsonify({
+                "code": -1,
+                "message": "Missing required fields"
+            }), 400
+        
+        questions_progress = progress_tracker.record_answers(
+            user_id, grade, subject, lesson_id, answers
+        )
+        
+        return jsonify({
+            "code": 0,
+            "message": "success",
+            "data": {"questions_progress": questions_progress}
+        })
+    except Exception as e:
+        logger.error(f"Record answers bulk error: {e}")
+        return jsonify({"code": -1, "message": str(e)}), 500
+
 @app.post("/api/progress/complete-lesson")
 def complete_lesson_progress():
     """Mark a lesson as completed"""
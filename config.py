@@ -15,6 +15,8 @@ class Config:
     USE_XPU = True
     XPU_DEVICE = "xpu:0"
     MEMORY_FRACTION = 0.8
+    PHI_LOW_BIT = "sym_int4"  # ipex-llm weight format for Phi: "sym_int4", "asym_int4", "nf4", "fp8"
+    PHI_TORCH_COMPILE = False  # torch.compile the Phi decode step (experimental with ipex-llm low-bit kernels)
     
     # Flask configuration
     HOST = "localhost"
@@ -25,6 +27,11 @@ class Config:
     # Paths
     MODEL_CACHE_DIR = "./models_cache"
     
+    # Mistral backend: "vulkan" (llama-server GGUF) or "openvino" (INT4 IR)
+    MISTRAL_BACKEND = "vulkan"
+    MISTRAL_OV_DIR = "./mistral_ov"  # optimum-cli export openvino ... --weight-format int4 mistral_ov/
+    OV_CACHE_DIR = "./ov_cache"  # Compiled OpenVINO kernel cache
+    
     @staticmethod
     def create_directories():
         os.makedirs(Config.MODEL_CACHE_DIR, exist_ok=True)
@@ -9,9 +9,20 @@ v6: OpenVINO or SYCL backends for XMX acceleration (8-12 tok/s target)
 from abc import ABC, abstractmethod
 from typing import Dict, List, Optional, Any
 import logging
+import os
+import tempfile
 
 logger = logging.getLogger(__name__)
 
+# llama-server log is rotated to <name>.1 once it grows past this size
+SERVER_LOG_MAX_BYTES = 10 * 1024 * 1024
+
+# llama-server decode slots: concurrent requests (a classroom submitting answers
+# together) are continuously batched into one forward pass per token instead of
+# queueing. Each slot gets the model's full context window, so the KV cache is
+# LLAMA_SERVER_PARALLEL times larger (~4GB for Mistral at 8k, fits the 12GB B580).
+LLAMA_SERVER_PARALLEL = 4
+
 
 class BaseAIModel(ABC):
     """
@@ -35,6 +46,8 @@ class BaseAIModel(ABC):
         self.is_loaded = False
         self.model_name = "Base Model"
         self.model_info: Dict[str, Any] = {}
+        self._server_log = None
+        self._server_log_path: Optional[str] = None
     
     @abstractmethod
     def load_model(self) -> Dict[str, Any]:
@@ -124,6 +137,71 @@ class BaseAIModel(ABC):
             logger.error(f"{self.model_name} not loaded")
             return f"Error: {self.model_name} not loaded"
         return None
+    
+    def _llama_server_cpu_args(self, model_path: str) -> List[str]:
+        """
+        CPU-side llama-server flags sized to the host (llama-optimus heuristics).
+        
+        -t  = physical cores (generation threads)
+        -tb = logical cores (batch/prefill threads)
+        --mlock on Windows when the model comfortably fits in free RAM,
+        so the weights are never paged out.
+        """
+        cpu_count = os.cpu_count() or 4
+        n_threads = max(1, cpu_count // 2)
+        args = ["-t", str(n_threads), "-tb", str(cpu_count)]
+        
+        if os.name == 'nt':
+            try:
+                import psutil
+                if os.path.getsize(model_path) < psutil.virtual_memory().available // 2:
+                    args.append("--mlock")
+            except Exception as e:
+                logger.warning(f"Skipping --mlock, could not check free RAM: {e}")
+        
+        logger.info(f"llama-server CPU args: {' '.join(args)}")
+        return args
+    
+    def _llama_server_batch_args(self, ctx_size: int) -> List[str]:
+        """
+        Context and slot flags for continuous batching.
+        
+        llama-server splits -c evenly across the -np slots, so the total is
+        ctx_size per slot times the slot count - each request keeps the whole
+        ctx_size window.
+        """
+        total_ctx = ctx_size * LLAMA_SERVER_PARALLEL
+        return ["-c", str(total_ctx), "-np", str(LLAMA_SERVER_PARALLEL), "-cb"]
+    
+    def _open_server_log(self):
+        """
+        Open the llama-server log file for stdout/stderr.
+        
+        llama-server prints per-request stats; an undrained subprocess.PIPE
+        fills after ~64KB and blocks the server in write() mid-generation.
+        """
+        log_path = os.path.join(tempfile.gettempdir(), f"llama_{self.__class__.__name__}.log")
+        if os.path.exists(log_path) and os.path.getsize(log_path) > SERVER_LOG_MAX_BYTES:
+            os.replace(log_path, f"{log_path}.1")
+        
+        self._server_log_path = log_path
+        self._server_log = open(log_path, "ab", buffering=0)
+        logger.info(f"llama-server output: {log_path}")
+        return self._server_log
+    
+    def _read_server_log_tail(self, max_bytes: int = 4096) -> str:
+        """Read the end of the llama-server log (for crash diagnostics)"""
+        if not self._server_log_path or not os.path.exists(self._server_log_path):
+            return ""
+        with open(self._server_log_path, "rb") as f:
+            f.seek(max(0, os.path.getsize(self._server_log_path) - max_bytes))
+            return f.read().decode(errors="replace")
+    
+    def _close_server_log(self):
+        """Close the llama-server log file"""
+        if self._server_log:
+            self._server_log.close()
+            self._server_log = None
 
 
 class ModelFactory:
@@ -149,7 +227,7 @@ class ModelFactory:
         Create model instance with specified backend.
         
         Args:
-            model_name: Model identifier ("gpt-oss-20b", "llama-3.1-8b")
+            model_name: Model identifier ("gpt-oss-20b", "llama-3.1-8b", "mistral-7b")
             backend: Backend preference ("vulkan", "openvino", "sycl", "cuda", "auto")
             config: Configuration dictionary
         
@@ -183,6 +261,17 @@ class ModelFactory:
             else:
                 raise ValueError(f"Backend '{backend}' not available for GPT-OSS (v5: vulkan only)")
         
+        # Mistral 7B Instruct
+        elif model_name.lower() in ["mistral-7b", "mistral"]:
+            if backend == "vulkan":
+                from models.mistral_model import MistralModel
+                return MistralModel(config)
+            elif backend == "openvino":
+                from models.mistral_openvino import MistralOVModel
+                return MistralOVModel(config)
+            else:
+                raise ValueError(f"Backend '{backend}' not available for Mistral (vulkan, openvino)")
+        
         # Llama 3.1 8B
         elif model_name.lower() in ["llama-3.1-8b", "llama3.1", "llama"]:
             if backend == "vulkan":
@@ -193,7 +282,7 @@ class ModelFactory:
                 raise ValueError(f"Backend '{backend}' not available for Llama 3.1 (v5: vulkan only)")
         
         else:
-            raise ValueError(f"Model '{model_name}' not recognized. Available: gpt-oss-20b, llama-3.1-8b")
+            raise ValueError(f"Model '{model_name}' not recognized. Available: gpt-oss-20b, llama-3.1-8b, mistral-7b")
     
     @staticmethod
     def list_available_backends() -> List[str]:
@@ -205,15 +294,15 @@ class ModelFactory:
         """
         backends = ["vulkan"]  # v5: Vulkan only
         
+        try:
+            import openvino
+            backends.append("openvino")
+            logger.info("OpenVINO backend available (XMX acceleration)")
+        except ImportError:
+            pass
+        
         # v6: Check for Intel-optimized backends
         # try:
-        #     import openvino
-        #     backends.append("openvino")
-        #     logger.info("OpenVINO backend available (XMX acceleration)")
-        # except ImportError:
-        #     pass
-        #
-        # try:
         #     import intel_extension_for_pytorch as ipex
         #     import torch
         #     if torch.xpu.is_available():
@@ -77,8 +77,8 @@ class GPTOSSModel(BaseAIModel):
             
             self.server_process = subprocess.Popen(
                 cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                stdout=self._open_server_log(),
+                stderr=subprocess.STDOUT,
                 cwd=os.path.dirname(self.llama_server)
             )
             
@@ -96,12 +96,10 @@ class GPTOSSModel(BaseAIModel):
                 
                 # Check if process crashed early
                 if self.server_process.poll() is not None:
-                    stderr = self.server_process.stderr.read() if self.server_process.stderr else b""
-                    stdout = self.server_process.stdout.read() if self.server_process.stdout else b""
+                    output = self._read_server_log_tail()
                     logger.error(f"llama-server crashed early!")
-                    logger.error(f"STDOUT: {stdout.decode()}")
-                    logger.error(f"STDERR: {stderr.decode()}")
-                    raise RuntimeError(f"llama-server crashed: {stderr.decode()}")
+                    logger.error(f"OUTPUT: {output}")
+                    raise RuntimeError(f"llama-server crashed: {output}")
                 
                 # Log progress every 10 seconds
                 if (i + 1) % 10 == 0:
@@ -111,12 +109,10 @@ class GPTOSSModel(BaseAIModel):
             else:
                 # Timeout reached - capture output for debugging
                 if self.server_process.poll() is not None:
-                    stderr = self.server_process.stderr.read() if self.server_process.stderr else b""
-                    stdout = self.server_process.stdout.read() if self.server_process.stdout else b""
+                    output = self._read_server_log_tail()
                     logger.error(f"llama-server process ended")
-                    logger.error(f"STDOUT: {stdout.decode()}")
-                    logger.error(f"STDERR: {stderr.decode()}")
-                    raise RuntimeError(f"llama-server crashed: {stderr.decode()}")
+                    logger.error(f"OUTPUT: {output}")
+                    raise RuntimeError(f"llama-server crashed: {output}")
                 raise TimeoutError("llama-server failed to start within 2 minutes")
             
             load_time = time.time() - start_time
@@ -141,6 +137,7 @@ class GPTOSSModel(BaseAIModel):
             if self.server_process:
                 self.server_process.kill()
                 self.server_process = None
+            self._close_server_log()
             raise
     
     def generate_response(self, user_message, max_new_tokens=512, temperature=0.7, 
@@ -203,7 +200,8 @@ class GPTOSSModel(BaseAIModel):
                 "n_predict": max_new_tokens,
                 "temperature": temperature,
                 "top_p": top_p,
-                "stop": ["<|end|>", "<|start|>user"]  # Stop at end tag or new user message
+                "stop": ["<|end|>", "<|start|>user"],  # Stop at end tag or new user message
+                "cache_prompt": True  # Reuse the KV cache of the prompt prefix shared with the last request
             }
             
             response = requests.post(
@@ -304,6 +302,7 @@ class GPTOSSModel(BaseAIModel):
                 self.server_process.kill()
             self.server_process = None
         
+        self._close_server_log()
         self.is_loaded = False
         logger.info("GPT-OSS 20B server stopped, 13.9GB VRAM freed")
     
@@ -72,16 +72,17 @@ class Llama31Model(BaseAIModel):
             cmd = [
                 self.llama_server,
                 "-m", self.model_path,
-                "-c", "4096",        # Context size (Llama 3.1 supports 128K but 4K is enough)
+                *self._llama_server_batch_args(4096),  # Context size per slot (Llama 3.1 supports 128K), batched slots
                 "-ngl", "-1",        # GPU layers (all)
                 "--port", "8080",
-                "--host", "localhost"
+                "--host", "localhost",
+                *self._llama_server_cpu_args(self.model_path)  # CPU threads sized to host
             ]
             
             self.server_process = subprocess.Popen(
                 cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                stdout=self._open_server_log(),
+                stderr=subprocess.STDOUT,
                 cwd=os.path.dirname(self.llama_server)
             )
             
@@ -104,8 +105,7 @@ class Llama31Model(BaseAIModel):
                 time.sleep(1)
             else:
                 if self.server_process.poll() is not None:
-                    stderr = self.server_process.stderr.read() if self.server_process.stderr else b""
-                    raise RuntimeError(f"llama-server crashed: {stderr.decode()}")
+                    raise RuntimeError(f"llama-server crashed: {self._read_server_log_tail()}")
                 raise TimeoutError("llama-server failed to start within 120 seconds")
             
             load_time = time.time() - start_time
@@ -130,10 +130,11 @@ class Llama31Model(BaseAIModel):
             if self.server_process:
                 self.server_process.kill()
                 self.server_process = None
+            self._close_server_log()
             raise
     
     def generate_response(self, user_message, max_new_tokens=512, temperature=0.7, 
-                          top_p=0.9, system_prompt_override=None, conversation_history=None, **kwargs):
+                          top_p=0.9, system_prompt_override=None, conversation_history=None, stop=None, **kwargs):
         """
         Generate response using Llama 3.1 8B via llama-server
         
@@ -144,6 +145,7 @@ class Llama31Model(BaseAIModel):
             top_p: Nucleus sampling parameter
             system_prompt_override: Optional system prompt
             conversation_history: List of previous messages
+            stop: Optional extra strings that end generation
             
         Returns:
             str: Generated response (direct answer, no reasoning)
@@ -180,7 +182,8 @@ class Llama31Model(BaseAIModel):
                 "n_predict": max_new_tokens,
                 "temperature": temperature,
                 "top_p": top_p,
-                "stop": ["<|eot_id|>", "<|end_of_text|>"]
+                "stop": ["<|eot_id|>", "<|end_of_text|>"] + list(stop or []),
+                "cache_prompt": True  # Reuse the KV cache of the prompt prefix shared with the last request
             }
             
             response = requests.post(
@@ -217,5 +220,5 @@ class Llama31Model(BaseAIModel):
             finally:
                 self.server_process = None
                 self.is_loaded = False
-                self.is_loaded = False
+                self._close_server_log()
                 logger.info("Llama 3.1 8B server stopped")
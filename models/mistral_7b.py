@@ -4,11 +4,15 @@ Uses IPEX-LLM with 4-bit quantization for Intel XPU
 """
 from ipex_llm.transformers import AutoModelForCausalLM
 from transformers import AutoTokenizer
+from huggingface_hub import snapshot_download
 import logging
 import time
 
 logger = logging.getLogger(__name__)
 
+# Files from the Hub repo needed by from_pretrained: configs, tokenizer and safetensors weights
+MODEL_FILE_PATTERNS = ["*.json", "*.safetensors", "tokenizer.model"]
+
 
 class MistralModel:
     """Mistral 7B model optimized for Intel XPU"""
@@ -34,12 +38,17 @@ class MistralModel:
         try:
             logger.info(f"Loading Mistral 7B model: {model_id}")
 
-            # Pre-download model files to cache to avoid issues
-            logger.info("Pre-downloading Mistral model files to cache...")
-            AutoTokenizer.from_pretrained(
+            # Fetch model + tokenizer files in one threaded snapshot download, then
+            # load everything from local files. Only the safetensors shards are
+            # fetched - the repo also carries duplicate pytorch_model-*.bin and
+            # consolidated.safetensors weights. On a warm cache this still makes
+            # one network request to check the revision, but downloads nothing.
+            logger.info("Fetching Mistral model files to cache...")
+            snapshot_download(
                 model_id,
                 cache_dir=self.config.MODEL_CACHE_DIR,
-                trust_remote_code=True
+                allow_patterns=MODEL_FILE_PATTERNS,
+                ignore_patterns=["consolidated*"]
             )
             logger.info("✅ Mistral model files cached")
 
@@ -50,17 +59,21 @@ class MistralModel:
                 load_in_4bit=True,
                 trust_remote_code=True,
                 attn_implementation='eager',  # Avoid DynamicCache issues
-                cache_dir=self.config.MODEL_CACHE_DIR
+                cache_dir=self.config.MODEL_CACHE_DIR,
+                local_files_only=True
             )
             
             # Move to XPU
             self.model = self.model.to(self.device)
             
-            # Load tokenizer
+            # Load tokenizer - Mistral uses the standard Llama tokenizer, so no
+            # remote code scan; use_fast gives the Rust-backed LlamaTokenizerFast
             self.tokenizer = AutoTokenizer.from_pretrained(
                 model_id,
                 cache_dir=self.config.MODEL_CACHE_DIR,
-                trust_remote_code=True
+                use_fast=True,
+                legacy=False,
+                local_files_only=True
             )
 
             if self.tokenizer.pad_token is None:
@@ -120,11 +133,12 @@ class MistralModel:
             
             generation_time = time.time() - start_time
             
-            # Decode response
-            generated_ids = outputs[0][inputs['input_ids'].shape[1]:]
-            response_text = self.tokenizer.decode(generated_ids, skip_special_tokens=True).strip()
-            
-            tokens_generated = len(generated_ids)
+            # Decode response - slice off the prompt on device, then batch_decode
+            # (fast tokenizer path) so the input tokens never round-trip to CPU
+            new_ids = outputs[:, inputs['input_ids'].shape[1]:]
+            response_text = self.tokenizer.batch_decode(new_ids, skip_special_tokens=True)[0].strip()
+
+            tokens_generated = new_ids.shape[1]
             logger.info(f"Mistral generated {tokens_generated} tokens in {generation_time:.2f}s ({tokens_generated/generation_time:.2f} tok/s)")
             
             return response_text
@@ -8,6 +8,7 @@ v6: OpenVINO or SYCL for XMX engines (faster inference)
 """
 import subprocess
 import requests
+import json
 import logging
 import time
 import os
@@ -61,17 +62,17 @@ class MistralModel(BaseAIModel):
             "--host", "127.0.0.1",
             "--port", "8080",
             "-ngl", "99",  # Offload all layers to GPU
-            "-c", "8192",  # Context window (Mistral supports 8k)
-            "-t", "8",     # CPU threads for non-GPU ops
-            "--n-gpu-layers", "99"
+            *self._llama_server_batch_args(8192),  # Context window per slot (Mistral supports 8k), batched slots
+            "--n-gpu-layers", "99",
+            *self._llama_server_cpu_args(self.model_path)  # CPU threads for non-GPU ops
         ]
         
         # Start server process
         try:
             self.server_process = subprocess.Popen(
                 cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                stdout=self._open_server_log(),
+                stderr=subprocess.STDOUT,
                 cwd=os.path.dirname(self.llama_server)
             )
             
@@ -97,6 +98,7 @@ class MistralModel(BaseAIModel):
             if self.server_process:
                 self.server_process.kill()
                 self.server_process = None
+            self._close_server_log()
             raise
     
     def unload(self):
@@ -111,10 +113,11 @@ class MistralModel(BaseAIModel):
             finally:
                 self.server_process = None
                 self.is_loaded = False
+                self._close_server_log()
     
     def generate_response(self, prompt, max_new_tokens=256, temperature=0.7, 
                          top_p=0.9, conversation_history=None, 
-                         system_prompt_override=None, language_code="en"):
+                         system_prompt_override=None, language_code="en", stop=None):
         """
         Generate response using Mistral 7B via llama.cpp server.
         
@@ -126,6 +129,7 @@ class MistralModel(BaseAIModel):
             conversation_history: List of previous messages for context
             system_prompt_override: Custom system prompt
             language_code: Language for response (Mistral supports many languages)
+            stop: Optional list of strings that end generation
         
         Returns:
             Generated text response
@@ -133,26 +137,7 @@ class MistralModel(BaseAIModel):
         if not self.server_process:
             raise RuntimeError("Model not loaded. Call load_model() first.")
         
-        # Build messages for chat completion
-        messages = []
-        
-        # System prompt
-        system_prompt = system_prompt_override or self._get_system_prompt(language_code)
-        if system_prompt:
-            messages.append({
-                "role": "system",
-                "content": system_prompt
-            })
-        
-        # Add conversation history (last 3 exchanges)
-        if conversation_history:
-            messages.extend(conversation_history[-6:])  # Last 3 Q&A pairs = 6 messages
-        
-        # Add current user message
-        messages.append({
-            "role": "user",
-            "content": prompt
-        })
+        messages = self._build_messages(prompt, conversation_history, system_prompt_override, language_code)
         
         # Call llama.cpp chat completions API
         try:
@@ -163,7 +148,9 @@ class MistralModel(BaseAIModel):
                     "max_tokens": max_new_tokens,
                     "temperature": temperature,
                     "top_p": top_p,
-                    "stream": False
+                    "stream": False,
+                    "stop": stop or [],
+                    "cache_prompt": True  # Reuse the KV cache of the prompt prefix shared with the last request
                 },
                 timeout=120  # 2 minute timeout
             )
@@ -182,6 +169,79 @@ class MistralModel(BaseAIModel):
             logger.error(f"Mistral generation error: {e}")
             return f"An error occurred: {str(e)}"
     
+    def stream_response(self, prompt, max_new_tokens=256, temperature=0.7,
+                        top_p=0.9, conversation_history=None,
+                        system_prompt_override=None, language_code="en", stop=None):
+        """
+        Generate response, yielding text chunks as llama-server decodes them.
+        
+        Same arguments as generate_response(). Closing the generator early
+        closes the connection, which makes llama-server stop decoding.
+        """
+        if not self.server_process:
+            raise RuntimeError("Model not loaded. Call load_model() first.")
+        
+        messages = self._build_messages(prompt, conversation_history, system_prompt_override, language_code)
+        
+        try:
+            with requests.post(
+                f"{self.server_url}/v1/chat/completions",
+                json={
+                    "messages": messages,
+                    "max_tokens": max_new_tokens,
+                    "temperature": temperature,
+                    "top_p": top_p,
+                    "stream": True,
+                    "stop": stop or [],
+                    "cache_prompt": True
+                },
+                stream=True,
+                timeout=120
+            ) as response:
+                response.raise_for_status()
+                
+                # Server-sent events: "data: {json}" lines, ending with "data: [DONE]"
+                for line in response.iter_lines():
+                    if not line.startswith(b"data: "):
+                        continue
+                    data = line[6:]
+                    if data == b"[DONE]":
+                        break
+                    chunk = json.loads(data)["choices"][0]["delta"].get("content")
+                    if chunk:
+                        yield chunk
+                        
+        except requests.exceptions.Timeout:
+            logger.error("Mistral streaming timeout")
+            yield "I apologize, but the response took too long. Please try again."
+        except Exception as e:
+            logger.error(f"Mistral streaming error: {e}")
+            yield f"An error occurred: {str(e)}"
+    
+    def _build_messages(self, prompt, conversation_history, system_prompt_override, language_code):
+        """Build the chat completion messages: system prompt, recent history, user message"""
+        messages = []
+        
+        # System prompt
+        system_prompt = system_prompt_override or self._get_system_prompt(language_code)
+        if system_prompt:
+            messages.append({
+                "role": "system",
+                "content": system_prompt
+            })
+        
+        # Add conversation history (last 3 exchanges)
+        if conversation_history:
+            messages.extend(conversation_history[-6:])  # Last 3 Q&A pairs = 6 messages
+        
+        # Add current user message
+        messages.append({
+            "role": "user",
+            "content": prompt
+        })
+        
+        return messages
+    
     def _get_system_prompt(self, language_code):
         """Get system prompt for Mistral (supports multilingual)"""
         prompts = {
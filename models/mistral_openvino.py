@@ -0,0 +1,163 @@
+"""
+Mistral 7B Instruct - OpenVINO backend (v6)
+Runs an INT4 OpenVINO IR on the Arc GPU's XMX engines, without the
+transformers + IPEX-LLM + PyTorch stack in-process.
+
+One-time export:
+    optimum-cli export openvino --model mistralai/Mistral-7B-Instruct-v0.2 --weight-format int4 mistral_ov/
+
+Target: Intel Arc B580 (12GB VRAM)
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from models.base_model import BaseAIModel
+from utils.language_support import language_manager
+
+logger = logging.getLogger(__name__)
+
+
+class MistralOVModel(BaseAIModel):
+    """
+    Mistral 7B Instruct on OpenVINO GenAI kernels.
+
+    Backend: OpenVINO (XMX)
+    VRAM: ~4-5GB (INT4 weights, u8 KV cache)
+    """
+
+    IS_REASONING_MODEL = False
+    REASONING_MARKER = None
+    BACKEND = "openvino"
+
+    def __init__(self, config):
+        """Initialize Mistral OpenVINO model (call load_model() to compile)"""
+        super().__init__(config)
+        self.model_name = "Mistral 7B Instruct (OpenVINO)"
+        self.device = "GPU"
+        self.model_dir = Config.MISTRAL_OV_DIR
+
+    def load_model(self) -> Dict[str, Any]:
+        """Load and compile the OpenVINO IR on the GPU plugin."""
+        from optimum.intel import OVModelForCausalLM
+        from transformers import AutoTokenizer
+
+        logger.info(f"Loading Mistral OpenVINO IR from {self.model_dir}...")
+        start_time = time.time()
+
+        try:
+            self.model = OVModelForCausalLM.from_pretrained(
+                self.model_dir,
+                device=self.device,
+                ov_config={
+                    "CACHE_DIR": Config.OV_CACHE_DIR,  # Reuse compiled kernels across runs
+                    "PERFORMANCE_HINT": "LATENCY",
+                    "KV_CACHE_PRECISION": "u8"  # Halves KV cache VRAM
+                }
+            )
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir, use_fast=True)
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+        except Exception as e:
+            logger.error(f"Failed to load Mistral OpenVINO model: {e}")
+            self.model = None
+            self.tokenizer = None
+            raise
+
+        load_time = time.time() - start_time
+        self.is_loaded = True
+        self.model_info = {
+            'status': 'ready',
+            'model_name': self.model_name,
+            'vram_usage': '~4-5GB',
+            'load_time': f"{load_time:.1f}s",
+            'backend': self.BACKEND,
+            'quantization': 'INT4 (weights), u8 (KV cache)'
+        }
+        logger.info(f"✅ Mistral OpenVINO loaded in {load_time:.1f}s")
+        return self.model_info
+
+    def generate_response(
+        self,
+        user_message: str,
+        max_new_tokens: int = 256,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        system_prompt_override: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        language_code: str = "en",
+        stop: Optional[List[str]] = None,
+        **kwargs
+    ) -> str:
+        """
+        Generate response using the OpenVINO-compiled Mistral.
+
+        Args:
+            user_message: User input text
+            max_new_tokens: Maximum tokens to generate
+            temperature: Sampling temperature (0.0 = greedy)
+            top_p: Nucleus sampling parameter
+            system_prompt_override: Custom system prompt
+            conversation_history: List of previous messages for context
+            language_code: Language for response
+            stop: Optional list of strings that end generation
+
+        Returns:
+            Generated text response
+        """
+        error = self.validate_loaded()
+        if error:
+            return error
+
+        system_prompt = system_prompt_override or language_manager.get_system_prompt(language_code)
+
+        # Mistral's chat template has no system role and requires alternating
+        # user/assistant turns - drop leading non-user turns left by trimming the
+        # history, then prepend the system prompt to the first user turn
+        history = conversation_history[-6:] if conversation_history else []
+        first_user = next((i for i, message in enumerate(history) if message["role"] == "user"), len(history))
+        messages = list(history[first_user:])
+        messages.append({"role": "user", "content": user_message})
+        messages[0] = {"role": "user", "content": f"{system_prompt}\n\n{messages[0]['content']}"}
+
+        try:
+            inputs = self.tokenizer.apply_chat_template(
+                messages,
+                add_generation_prompt=True,
+                return_tensors="pt",
+                return_dict=True
+            )
+
+            # stop_strings needs the tokenizer to match across token boundaries
+            stop_kwargs = {'stop_strings': stop, 'tokenizer': self.tokenizer} if stop else {}
+
+            start_time = time.time()
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                do_sample=temperature > 0.0,
+                pad_token_id=self.tokenizer.eos_token_id,
+                **stop_kwargs
+            )
+            generation_time = time.time() - start_time
+
+            new_ids = outputs[:, inputs['input_ids'].shape[1]:]
+            response_text = self.tokenizer.batch_decode(new_ids, skip_special_tokens=True)[0].strip()
+
+            tokens_generated = new_ids.shape[1]
+            logger.info(f"Mistral OV generated {tokens_generated} tokens in {generation_time:.2f}s ({tokens_generated/generation_time:.2f} tok/s)")
+            return response_text
+
+        except Exception as e:
+            logger.error(f"Mistral OpenVINO generation error: {e}")
+            return f"An error occurred: {str(e)}"
+
+    def unload(self) -> None:
+        """Release the compiled model"""
+        self.model = None
+        self.tokenizer = None
+        self.is_loaded = False
+        logger.info("Mistral OpenVINO model unloaded")
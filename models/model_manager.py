@@ -2,12 +2,55 @@
 Model Manager - Central registry for all AI models
 Handles model selection, initialization, and switching
 """
+import functools
 import logging
-from typing import Dict, Optional
+import re
+from importlib import metadata
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
 from config import Config
+from models.registry import model_registry
 
 logger = logging.getLogger(__name__)
 
+# Leading release numbers of a version string ("4.45.0.dev0" -> 4.45.0)
+_RELEASE_RE = re.compile(r'\d+(?:\.\d+)*')
+
+
+def _release(version: str) -> tuple:
+    """Release segment of a version as an int tuple, for ordering comparisons"""
+    match = _RELEASE_RE.match(version.strip().lstrip('vV'))
+    return tuple(int(part) for part in match.group().split('.')) if match else ()
+
+
+@functools.lru_cache(maxsize=1)
+def _compat_map() -> Mapping[str, bool]:
+    """
+    Check which models are compatible with the installed transformers version.
+    Computed once per process from package metadata (transformers is not imported).
+    """
+    try:
+        version = metadata.version("transformers")
+        logger.info(f"Transformers version: {version}")
+    except metadata.PackageNotFoundError:
+        version = None
+        logger.warning("Transformers not installed - only llama.cpp models available")
+    
+    compat = {}
+    for model_key, model_info in ModelManager.AVAILABLE_MODELS.items():
+        required = model_info['transformers_version']
+        if required == 'N/A':
+            compat[model_key] = True  # Doesn't use transformers
+        elif version is None:
+            compat[model_key] = False
+        elif required.endswith('+'):
+            compat[model_key] = _release(version) >= _release(required[:-1])
+        else:
+            compat[model_key] = version.startswith(required)
+    
+    logger.info("Model compatibility check complete")
+    return MappingProxyType(compat)
+
 
 class ModelManager:
     """
@@ -23,8 +66,7 @@ class ModelManager:
             'use_case': 'chat',
             'transformers_version': '4.45+',
             'vram': '4-6GB',
-            'exclusive': False,
-            'compatible': False  # Set based on transformers version
+            'exclusive': False
         },
         'mistral-7b-v0.2': {
             'class': 'models.mistral_7b.MistralModel',
@@ -32,8 +74,7 @@ class ModelManager:
             'use_case': 'evaluation',
             'transformers_version': '4.40+',
             'vram': '6-8GB',
-            'exclusive': False,
-            'compatible': False
+            'exclusive': False
         },
         'mistral-7b-v0.3': {
             'class': 'models.mistral_7b.MistralModel',
@@ -41,8 +82,7 @@ class ModelManager:
             'use_case': 'evaluation',
             'transformers_version': '4.45+',
             'vram': '6-8GB',
-            'exclusive': False,
-            'compatible': False
+            'exclusive': False
         },
         'gpt-j-6b': {
             'class': 'models.gptj_model.GPTJModel',
@@ -50,8 +90,7 @@ class ModelManager:
             'use_case': 'both',
             'transformers_version': '4.37+',
             'vram': '5-7GB',
-            'exclusive': False,
-            'compatible': True  # Should work with current stack
+            'exclusive': False
         },
         'gpt-oss-20b': {
             'class': 'models.gptoss_model.GPTOSSModel',
@@ -60,7 +99,6 @@ class ModelManager:
             'transformers_version': 'N/A',  # Uses llama.cpp, not transformers
             'vram': '13.9GB',
             'exclusive': True,  # ⚠️ Requires exclusive GPU usage
-            'compatible': True,  # Always compatible (doesn't use transformers)
             'format': 'GGUF'
         }
     }
@@ -71,33 +109,7 @@ class ModelManager:
         self.chat_model = None
         self.evaluation_model = None
         self.loaded_models: Dict[str, any] = {}
-        
-        # Detect transformers version
-        self._detect_compatibility()
-    
-    def _detect_compatibility(self):
-        """Check which models are compatible with current transformers version"""
-        try:
-            import transformers
-            version = transformers.__version__
-            logger.info(f"Transformers version: {version}")
-            
-            # Parse version (e.g., "4.37.0" -> 4.37)
-            major_minor = float('.'.join(version.split('.')[:2]))
-            
-            # Update compatibility flags
-            for model_key, model_info in self.AVAILABLE_MODELS.items():
-                required = model_info['transformers_version']
-                if '+' in required:
-                    min_version = float(required.replace('+', ''))
-                    model_info['compatible'] = major_minor >= min_version
-                else:
-                    model_info['compatible'] = version.startswith(required)
-            
-            logger.info("Model compatibility check complete")
-            
-        except Exception as e:
-            logger.error(f"Failed to detect transformers version: {e}")
+        self._exclusive_loaded_key: Optional[str] = None  # Key of the loaded exclusive model, if any
     
     def get_available_models(self, use_case: Optional[str] = None):
         """
@@ -109,9 +121,10 @@ class ModelManager:
         Returns:
             Dict of compatible models
         """
+        compat = _compat_map()
         available = {}
         for key, info in self.AVAILABLE_MODELS.items():
-            if not info['compatible']:
+            if not compat[key]:
                 continue
             if use_case and info['use_case'] != use_case and info['use_case'] != 'both':
                 continue
@@ -136,7 +149,7 @@ class ModelManager:
         
         model_info = self.AVAILABLE_MODELS[model_key]
         
-        if not model_info['compatible']:
+        if not _compat_map()[model_key]:
             logger.error(f"Model {model_key} not compatible with current transformers version")
             return None
         
@@ -151,7 +164,7 @@ class ModelManager:
                 for key, instance in list(self.loaded_models.items()):
                     if key != model_key:
                         logger.info(f"  Unloading {key}...")
-                        instance.unload()
+                        model_registry.evict(key)
                         del self.loaded_models[key]
                 
                 self.chat_model = None
@@ -175,11 +188,7 @@ class ModelManager:
             return self.loaded_models[model_key]
         
         # REVERSE CHECK: Don't allow non-exclusive models if exclusive model is loaded
-        exclusive_loaded = any(
-            self.AVAILABLE_MODELS[key].get('exclusive', False) 
-            for key in self.loaded_models.keys()
-        )
-        if exclusive_loaded and not model_info.get('exclusive', False):
+        if self._exclusive_loaded_key and not model_info.get('exclusive', False):
             logger.error(f"Cannot load {model_key}: Exclusive model already loaded")
             logger.error(f"Unload exclusive model first!")
             return None
@@ -190,16 +199,28 @@ class ModelManager:
             module = __import__(module_path, fromlist=[class_name])
             ModelClass = getattr(module, class_name)
             
-            # Instantiate and load
+            # Get from registry (instantiates and loads on a miss, may evict LRU model)
             logger.info(f"Loading {model_info['display_name']}...")
-            model_instance = ModelClass(self.config)
+            model_instance = model_registry.get(model_key, ModelClass, self.config)
             
-            # Models with __init__ that auto-loads won't need explicit load_model()
-            if not model_instance.is_loaded and hasattr(model_instance, 'load_model'):
-                model_instance.load_model()
+            # Drop models the registry evicted to make room, and any role still
+            # pointing at one of them
+            self.loaded_models = {
+                key: instance for key, instance in self.loaded_models.items()
+                if model_registry.is_loaded(key)
+            }
+            if self._exclusive_loaded_key not in self.loaded_models:
+                self._exclusive_loaded_key = None
+            resident = list(self.loaded_models.values())
+            if not any(self.chat_model is instance for instance in resident):
+                self.chat_model = None
+            if not any(self.evaluation_model is instance for instance in resident):
+                self.evaluation_model = None
             
             # Cache the loaded model
             self.loaded_models[model_key] = model_instance
+            if model_info.get('exclusive', False):
+                self._exclusive_loaded_key = model_key
             
             # Assign to role
             if role == 'chat':
@@ -217,7 +238,8 @@ class ModelManager:
     def switch_model(self, model_key: str, role: str = 'chat'):
         """
         Switch to a different model for a given role.
-        Unloads current model if specified.
+        The current model stays resident in the registry so switching back
+        is instant; it is only unloaded under memory pressure.
         
         Args:
             model_key: New model to load
@@ -226,13 +248,7 @@ class ModelManager:
         Returns:
             bool: Success status
         """
-        # Unload current model for this role
-        current_model = self.chat_model if role == 'chat' else self.evaluation_model
-        if current_model:
-            logger.info(f"Unloading current {role} model: {current_model.model_name}")
-            current_model.unload()
-        
-        # Load new model
+        # Load new model (registry evicts the LRU model if VRAM budget is full)
         new_model = self.load_model(model_key, role)
         return new_model is not None
     
@@ -246,11 +262,11 @@ class ModelManager:
     
     def unload_all(self):
         """Unload all models and free memory"""
-        for model_key, model_instance in self.loaded_models.items():
-            logger.info(f"Unloading {model_key}...")
-            model_instance.unload()
+        logger.info(f"Unloading {', '.join(self.loaded_models) or 'nothing'}...")
+        model_registry.clear()
         
         self.loaded_models.clear()
+        self._exclusive_loaded_key = None
         self.chat_model = None
         self.evaluation_model = None
         logger.info("All models unloaded")
@@ -265,5 +281,15 @@ class ModelManager:
         }
 
 
-# Global model manager instance
-model_manager = ModelManager()
+# Global model manager instance - created on first access (PEP 562) so importing
+# this module doesn't construct the manager
+_model_manager: Optional[ModelManager] = None
+
+
+def __getattr__(name):
+    global _model_manager
+    if name == "model_manager":
+        if _model_manager is None:
+            _model_manager = ModelManager()
+        return _model_manager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -8,18 +8,144 @@ Solution: Import torch locally in methods, not at module level.
 """
 
 # DO NOT import torch here - it auto-loads IPEX in PyTorch 2.6!
+import copy
+import queue
+import re
+import threading
 import time
 import logging
+from concurrent.futures import Future
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Max distinct chat turns (system prompts + recent history messages) kept pre-tokenized
+TURN_IDS_CACHE_SIZE = 256
+
+# Max system prompts with precomputed KV cache (~100MB each on Phi 3.5)
+SYSTEM_PAST_CACHE_SIZE = 4
+
+# Max distinct sampling settings with a prebuilt GenerationConfig
+GENERATION_CONFIG_CACHE_SIZE = 32
+
+# On XPU out-of-memory, retry with half the token budget down to this floor
+OOM_MIN_NEW_TOKENS = 32
+
+# Concurrent requests arriving within the window are generated as one padded batch
+MAX_BATCH = 4
+BATCH_WINDOW_S = 0.01
+
+
+class _GenerationBatcher:
+    """
+    Coalesces concurrent generate requests (Flask serves each in its own thread)
+    into a single padded generate() call on one worker thread.
+    Decode is memory-bandwidth bound, so a batch costs little more than one request.
+    """
+    
+    def __init__(self, generate_batch, max_batch=MAX_BATCH, window=BATCH_WINDOW_S):
+        self._generate_batch = generate_batch
+        self._max_batch = max_batch
+        self._window = window
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="phi-batcher", daemon=True)
+        self._thread.start()
+    
+    def submit(self, prompt_ids, system_message, gen_kwargs):
+        """Queue a prompt; returns a Future resolving to the generated token ids"""
+        future = Future()
+        self._queue.put((prompt_ids, system_message, gen_kwargs, future))
+        return future
+    
+    def _collect(self):
+        """Block for one request, then gather more until the window closes or the batch is full"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._window
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            
+            # Only requests with identical sampling settings can share a generate() call
+            groups = {}
+            for item in batch:
+                groups.setdefault(tuple(sorted(item[2].items())), []).append(item)
+            
+            for items in groups.values():
+                try:
+                    results = self._generate_batch([(ids, system) for ids, system, _, _ in items], items[0][2])
+                    for (_, _, _, future), result in zip(items, results):
+                        future.set_result(result)
+                except Exception as e:
+                    for _, _, _, future in items:
+                        future.set_exception(e)
+
+
 class PhiTutor:
+    # Question classifier: one regex pass, each match reports its group name.
+    # Whole-word matches, so "hi" doesn't fire on "this" or "how" on "show".
+    # 'word' matches (empty) at every word start, so the same pass counts words;
+    # multi-word phrases look ahead for their second word instead of consuming it
+    _CLASSIFY_RE = re.compile(
+        r'(?P<word>(?<!\S)(?=\S))'
+        r'|(?P<greet>\b(?:hello|hi|hey|thanks|thank(?=\s+you\b)|bye|goodbye)\b)'
+        r'|(?P<explain>\b(?:explain|how|why|tell(?=\s+me\b)|describe|what(?=\s+is\b)|show(?=\s+me\b))\b)'
+        r'|(?P<math>[+\-*/]|\b(?:plus|minus|times|divided)\b)'
+    )
+    
+    _SENTENCE_END_RE = re.compile(r'[.\n]')
+    
+    # Exact (punctuation-stripped) greetings answered without running the model
+    _CANNED_RESPONSES = {
+        'hello': "Hello! How can I help you today?",
+        'hi': "Hi there! What would you like to learn?",
+        'hey': "Hey! What would you like to learn today?",
+        'thanks': "You're welcome!",
+        'thank you': "You're welcome!",
+        'bye': "Goodbye! Happy learning!",
+        'goodbye': "Goodbye! Happy learning!"
+    }
+    
+    _torch = None  # torch module, resolved on first use (never at import time)
+    
+    @classmethod
+    def _get_torch(cls):
+        """Import torch once and cache the module on the class"""
+        if cls._torch is None:
+            import torch
+            cls._torch = torch
+        return cls._torch
+    
     def __init__(self):
         self.model = None
         self.tokenizer = None
         self.device = None  # Defer device detection to avoid import hang with PyTorch 2.1.0a0
         self.is_loaded = False
+        self._turn_ids_cache = {}  # (role, content) -> token ids of that rendered chat turn
+        self._generation_prompt_ids = None  # Token ids of the assistant generation prompt
+        self._system_past_cache = {}  # system prompt -> past_key_values of the system turn
+        self._system_prefix_ids = {}  # language system prompt -> token ids (precomputed at load, never evicted)
+        self._input_ids_buf = None  # Reusable host buffers for a padded batch (pinned on XPU)
+        self._attention_mask_buf = None
+        self._input_ids_np = None  # numpy views sharing memory with the buffers above
+        self._attention_mask_np = None
+        self._batcher = None
+        self._static_cache_supported = True  # Cleared if transformers/model code rejects StaticCache
+        self._eager_forward = None  # Original forward while a torch.compile'd one is installed
+        self._copy_stream = None  # XPU stream for host->device input copies
+        self._sentence_stopper = None  # Stops short answers at the first sentence
+        self._cpu_bf16 = False  # CPU fallback runs in bf16 (AVX512-BF16/AMX) under autocast
+        self._generation_configs = {}  # (max_new_tokens, temperature, top_p) -> GenerationConfig
+        self._static_info = {}  # Model info that can't change after load (dtype, device name)
         
     def     _detect_intel_device(self):
         """
@@ -38,103 +164,118 @@ class PhiTutor:
         # 1. Import torch first
         # 2. Then import ipex_llm
         
-        # DEBUG: Check module state at start
-        import sys
-        print(f"[DEBUG] load_model() START - torch loaded: {'torch' in sys.modules}, IPEX loaded: {'intel_extension_for_pytorch' in sys.modules}")
-        
         # Import torch FIRST (official ipex-llm pattern for PyTorch 2.6)
-        import torch
-        print(f"[DEBUG] After torch import - torch loaded: {'torch' in sys.modules}, IPEX loaded: {'intel_extension_for_pytorch' in sys.modules}")
+        torch = self._get_torch()
         
         try:
             # Detect device now (safe after import completes)
             if self.device is None:
                 self.device = self._detect_intel_device()
             
-            print(f"[DEBUG] After _detect_intel_device() - torch loaded: {'torch' in sys.modules}, IPEX loaded: {'intel_extension_for_pytorch' in sys.modules}")
-            
             logger.info(f"Loading Phi 3.5 model: {Config.MODEL_NAME}")
             logger.info(f"Target device: {self.device}")
             
             Config.create_directories()
             
-            print(f"[DEBUG] After create_directories() - torch loaded: {'torch' in sys.modules}, IPEX loaded: {'intel_extension_for_pytorch' in sys.modules}")
-            
             # Load model FIRST (following official ipex-llm PyTorch 2.6 pattern)
             if self.device == 'xpu':
                 # Intel Arc GPU - use IPEX-LLM (AI Playground pattern)
                 logger.info("Loading with Intel IPEX-LLM optimization...")
                 
-                print(f"[DEBUG] BEFORE ipex_llm import - IPEX loaded: {'intel_extension_for_pytorch' in sys.modules}")
-                
                 # Import ipex_llm AFTER torch (official pattern for PyTorch 2.6)
                 from ipex_llm.transformers import AutoModelForCausalLM
                 
-                print(f"[DEBUG] AFTER ipex_llm import - IPEX loaded: {'intel_extension_for_pytorch' in sys.modules}")
+                logger.info(f"Loading model with IPEX-LLM {Config.PHI_LOW_BIT} quantization...")
                 
-                # Pre-download model with standard transformers to cache all files
-                from transformers import AutoTokenizer
-                logger.info("Pre-downloading model files to cache...")
-                print(f"[DEBUG] Downloading to cache: {Config.MODEL_CACHE_DIR}")
-                AutoTokenizer.from_pretrained(
-                    Config.MODEL_NAME,
-                    cache_dir=Config.MODEL_CACHE_DIR,
-                    trust_remote_code=True
+                load_kwargs = dict(
+                    load_in_low_bit=Config.PHI_LOW_BIT,  # Symmetric weight-only int4 with fused Arc GEMM kernels
+                    mixed_precision=True,  # lm_head in sym_int8: half the bytes of bf16 per decode step, better accuracy than int4
+                    trust_remote_code=True,
+                    cache_dir=Config.MODEL_CACHE_DIR,  # Use cached files
+                    low_cpu_mem_usage=True,     # Quantize shard-by-shard instead of materializing fp16 weights
+                    torch_dtype=torch.bfloat16, # bf16 activations run natively on Arc XMX units
+                    optimize_model=True         # ipex-llm fused norm/rope/SDPA decode kernels
                 )
-                logger.info("✅ Model files cached")
-                
-                # Now load with ipex-llm from cached files
-                logger.info("Loading model with IPEX-LLM 4-bit quantization...")
-                print(f"[DEBUG] Loading model: {Config.MODEL_NAME}")
-                
                 try:
+                    # Fused SDPA attention - much faster prefill than the eager attention loop
                     self.model = AutoModelForCausalLM.from_pretrained(
-                        Config.MODEL_NAME,
-                        load_in_4bit=True,          # 4-bit quantization for Intel GPU
-                        trust_remote_code=True,
-                        attn_implementation='eager',  # Use eager attention to avoid DynamicCache issues
-                        cache_dir=Config.MODEL_CACHE_DIR  # Use cached files
+                        Config.MODEL_NAME, attn_implementation='sdpa', **load_kwargs
+                    )
+                except (TypeError, ValueError) as e:
+                    # Some transformers versions reject SDPA for Phi 3.5 remote code (DynamicCache mismatch)
+                    logger.warning(f"SDPA attention unavailable, falling back to eager: {e}")
+                    self.model = AutoModelForCausalLM.from_pretrained(
+                        Config.MODEL_NAME, attn_implementation='eager', **load_kwargs
                     )
-                    print(f"[DEBUG] Model loaded successfully!")
-                except Exception as e:
-                    print(f"[DEBUG] Model loading error: {type(e).__name__}: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    raise
                 
+                # ipex-llm quantizes on the host, so this copies the 4-bit weights only
                 self.model = self.model.to('xpu')
+                
+                # Release host-side staging tensors and any transient XPU blocks from the move
+                import gc
+                gc.collect()
+                torch.xpu.empty_cache()
                 logger.info("✅ Model loaded with Intel XPU 4-bit optimization")
-                logger.info(f"XPU Memory: {torch.xpu.memory_allocated(0) / 1024**3:.2f} GB")
+                if logger.isEnabledFor(logging.INFO):  # memory_allocated() syncs the device
+                    logger.info(f"XPU Memory: {torch.xpu.memory_allocated(0) / 1024**3:.2f} GB allocated, "
+                                f"{torch.xpu.memory_reserved(0) / 1024**3:.2f} GB reserved")
                 
             else:
                 # CPU fallback
-                import torch  # Safe to import here for CPU path
                 logger.info("Loading with CPU (standard transformers)...")
                 from transformers import AutoModelForCausalLM
                 
+                # bf16 halves weight bandwidth on CPUs with native bf16 dot products
+                # (AVX512-BF16 on Cooper Lake+/Zen 4, AMX tiles on Sapphire Rapids+)
+                self._cpu_bf16 = (getattr(torch.cpu, '_is_avx512_bf16_supported', lambda: False)()
+                                  or getattr(torch.cpu, '_is_amx_tile_supported', lambda: False)())
+                cpu_dtype = torch.bfloat16 if self._cpu_bf16 else torch.float32
+                
                 self.model = AutoModelForCausalLM.from_pretrained(
                     Config.MODEL_NAME,
                     cache_dir=Config.MODEL_CACHE_DIR,
-                    torch_dtype=torch.float32,
+                    torch_dtype=cpu_dtype,
                     trust_remote_code=True,
-                    low_cpu_mem_usage=True
+                    low_cpu_mem_usage=True,
+                    device_map='cpu'  # Materialize weights in place, no extra .to() copy
                 )
-                self.model = self.model.to('cpu')
-                logger.info("✅ Model loaded on CPU")
+                logger.info(f"✅ Model loaded on CPU ({cpu_dtype})")
             
             # Load tokenizer AFTER model (now safe - IPEX already loaded by ipex-llm)
-            from transformers import AutoTokenizer
+            # Phi 3.5 uses the stock Llama tokenizer, so no remote code is needed
+            from transformers import AutoTokenizer, PreTrainedTokenizerFast
             logger.info("Loading tokenizer...")
             self.tokenizer = AutoTokenizer.from_pretrained(
                 Config.MODEL_NAME,
                 cache_dir=Config.MODEL_CACHE_DIR,
-                trust_remote_code=True
+                use_fast=True  # Rust tokenizers backend for encode/decode
             )
+            if isinstance(self.tokenizer, PreTrainedTokenizerFast):
+                logger.info(f"✅ Fast tokenizer loaded: {type(self.tokenizer).__name__}")
+            else:
+                logger.warning(f"Slow tokenizer in use: {type(self.tokenizer).__name__}")
             
             if self.tokenizer.pad_token is None:
                 self.tokenizer.pad_token = self.tokenizer.eos_token
             
+            self._input_ids_buf = self._alloc_input_buffer()
+            self._attention_mask_buf = self._alloc_input_buffer()
+            self._input_ids_np = self._input_ids_buf.numpy()
+            self._attention_mask_np = self._attention_mask_buf.numpy()
+            
+            self._precompute_system_prefixes()
+            
             self.model.eval()
+            self._static_info = {
+                "dtype": str(next(self.model.parameters()).dtype)
+            }
+            if self.device == 'xpu':
+                self._static_info["xpu_name"] = torch.xpu.get_device_name(0)
+            
+            if Config.PHI_TORCH_COMPILE:
+                self._compile_forward()
+            self._warmup()
+            self._batcher = _GenerationBatcher(self._generate_batch, max_batch=self._max_batch_for_memory())
             self.is_loaded = True
             
             # NOW it's safe to initialize GPU utilities - ipex-llm has imported IPEX
@@ -151,35 +292,511 @@ class PhiTutor:
             logger.error(f"❌ Error loading model: {e}")
             raise
     
+    def _build_past(self, requests, max_len, max_new_tokens):
+        """
+        KV cache for a batch.
+        
+        Single requests reuse the system turn's KV cache so prefill only covers
+        history + user turn (left padding shifts the system turn within a batch).
+        Otherwise a StaticCache is preallocated for prompt + response.
+        
+        Returns:
+            tuple: (past_key_values or None for the model default, is_static_cache)
+        """
+        if len(requests) == 1:
+            past_key_values = self._get_system_past(requests[0][1])
+            if past_key_values is not None:
+                return past_key_values, False
+        return self._make_static_cache(len(requests), max_len + max_new_tokens), True
+    
+    def _run_generate(self, inputs, past_key_values, static_cache, generate_kwargs):
+        """Call generate(), dropping the StaticCache for good if the model code rejects it"""
+        torch = self._get_torch()
+        # Keep ops that upcast (norms, softmax) in bf16 on the CPU fallback
+        with torch.inference_mode(), torch.autocast('cpu', dtype=torch.bfloat16, enabled=self._cpu_bf16):
+            if past_key_values is None:
+                return self.model.generate(**inputs, **generate_kwargs)
+            try:
+                return self.model.generate(**inputs, past_key_values=past_key_values, **generate_kwargs)
+            except (TypeError, AttributeError, ValueError) as e:
+                if not static_cache:
+                    raise
+                # Model code doesn't accept StaticCache - use its default dynamic cache from now on
+                logger.warning(f"StaticCache unsupported by model, using dynamic KV cache: {e}")
+                self._static_cache_supported = False
+                return self.model.generate(**inputs, **generate_kwargs)
+    
+    def _get_sentence_stopper(self):
+        """
+        StoppingCriteriaList that finishes a row as soon as it emits a token
+        containing '.' or a newline. The stop token ids are found once by
+        decoding the vocabulary, so the per-step check is a single isin().
+        """
+        if self._sentence_stopper is None:
+            torch = self._get_torch()
+            # transformers imports torch - can't subclass StoppingCriteria at module level
+            from transformers import StoppingCriteria, StoppingCriteriaList
+            
+            texts = self.tokenizer.batch_decode([[i] for i in range(len(self.tokenizer))])
+            stop_ids = torch.tensor(
+                [i for i, text in enumerate(texts) if '.' in text or '\n' in text],
+                device=self.device
+            )
+            
+            class SentenceStopper(StoppingCriteria):
+                def __call__(self, input_ids, scores, **kwargs):
+                    return torch.isin(input_ids[:, -1], stop_ids)
+            
+            self._sentence_stopper = StoppingCriteriaList([SentenceStopper()])
+        return self._sentence_stopper
+    
+    def _copy_inputs_to_device(self, **host_tensors):
+        """
+        Async host->device copy of pinned input tensors.
+        
+        On XPU the copies are issued on a dedicated stream, so they overlap with
+        the prefix KV lookup; the compute stream waits on it before generate().
+        """
+        torch = self._get_torch()
+        if self.device != 'xpu' or not hasattr(torch.xpu, 'Stream'):
+            return {name: t.to(self.device, non_blocking=True) for name, t in host_tensors.items()}
+        
+        if self._copy_stream is None:
+            self._copy_stream = torch.xpu.Stream()
+        compute_stream = torch.xpu.current_stream()
+        
+        with torch.xpu.stream(self._copy_stream):
+            device_tensors = {name: t.to(self.device, non_blocking=True) for name, t in host_tensors.items()}
+        compute_stream.wait_stream(self._copy_stream)
+        
+        # Tell the caching allocator these blocks are in use on the compute stream too
+        for t in device_tensors.values():
+            t.record_stream(compute_stream)
+        return device_tensors
+    
+    def _make_static_cache(self, batch_size, max_cache_len):
+        """
+        Preallocated KV cache (transformers StaticCache) so decode steps reuse
+        cached keys/values in fixed-shape buffers. Returns None if unavailable.
+        """
+        if not self._static_cache_supported:
+            return None
+        try:
+            from transformers.cache_utils import StaticCache
+            return StaticCache(
+                config=self.model.config,
+                max_batch_size=batch_size,
+                max_cache_len=max_cache_len,
+                device=self.device,
+                dtype=self.model.dtype
+            )
+        except (ImportError, TypeError) as e:
+            logger.warning(f"StaticCache unavailable, using dynamic KV cache: {e}")
+            self._static_cache_supported = False
+            return None
+    
+    def _compile_forward(self):
+        """
+        Wrap the model forward in torch.compile so each decode step (fixed shapes
+        with the StaticCache) runs as one compiled graph instead of per-op dispatch.
+        The original forward is kept for fallback if the warmup fails.
+        """
+        torch = self._get_torch()
+        try:
+            self._eager_forward = self.model.forward
+            self.model.forward = torch.compile(self.model.forward, mode='reduce-overhead', fullgraph=True, dynamic=False)
+            logger.info("✅ Model forward wrapped with torch.compile")
+        except Exception as e:
+            logger.warning(f"torch.compile unavailable, staying eager: {e}")
+            self._eager_forward = None
+    
+    def _max_batch_for_memory(self):
+        """
+        Cap the batch size so every sequence in a batch can hold a full-length
+        KV cache (MAX_LENGTH prompt + 1024 new tokens) in free XPU memory.
+        """
+        if self.device != 'xpu':
+            return MAX_BATCH
+        
+        torch = self._get_torch()
+        cfg = self.model.config
+        kv_heads_ratio = getattr(cfg, 'num_key_value_heads', cfg.num_attention_heads) / cfg.num_attention_heads
+        kv_bytes_per_token = 2 * cfg.num_hidden_layers * int(cfg.hidden_size * kv_heads_ratio) * 2  # K+V in bf16
+        seq_bytes = kv_bytes_per_token * (Config.MAX_LENGTH + 1024)
+        
+        try:
+            free_bytes = torch.xpu.mem_get_info(0)[0]
+        except (AttributeError, RuntimeError):
+            # mem_get_info is missing/unsupported on some XPU drivers - estimate from what torch holds
+            free_bytes = torch.xpu.get_device_properties(0).total_memory - torch.xpu.memory_reserved(0)
+        
+        max_batch = max(1, min(MAX_BATCH, int(free_bytes * 0.8) // seq_bytes))
+        logger.info(f"Batch size cap: {max_batch} ({free_bytes / 1024**3:.1f} GB free, "
+                    f"{seq_bytes / 1024**3:.2f} GB KV per sequence)")
+        return max_batch
+    
+    def _warmup(self):
+        """
+        Run a 1-token generation so kernel JIT compilation (and torch.compile, if
+        enabled) plus the default system prompt's KV cache happen at load time,
+        not on the first user query.
+        """
+        try:
+            start_time = time.time()
+            prompt_ids = self.format_prompt("Hello")
+            from utils.language_support import language_manager
+            self._generate_batch(
+                [(prompt_ids, language_manager.get_system_prompt('en'))],
+                {'max_new_tokens': 1, 'temperature': 0.1, 'top_p': 0.9}
+            )
+            logger.info(f"✅ Warmup generation done in {time.time() - start_time:.2f}s")
+        except Exception as e:
+            if self._eager_forward is not None:
+                # Compiled graph doesn't work with this model - restore eager forward
+                logger.warning(f"Compiled forward failed during warmup, reverting to eager: {e}")
+                self.model.forward = self._eager_forward
+                self._eager_forward = None
+                self._warmup()
+                return
+            logger.warning(f"Warmup generation failed (first request will be slower): {e}")
+    
+    def _alloc_input_buffer(self):
+        """Allocate a host-side (MAX_BATCH, MAX_LENGTH) buffer, pinned when targeting XPU"""
+        torch = self._get_torch()
+        shape = (MAX_BATCH, Config.MAX_LENGTH)
+        if self.device == 'xpu':
+            try:
+                return torch.empty(shape, dtype=torch.long, pin_memory=True)
+            except RuntimeError as e:
+                logger.warning(f"Pinned input buffer unavailable, using pageable memory: {e}")
+        return torch.empty(shape, dtype=torch.long)
+    
+    def _render_turn(self, message):
+        """
+        Render a single chat turn as template text.
+        
+        The turn is rendered followed by a placeholder user turn and cut there,
+        since rendering it alone would append the template's trailing eos token.
+        """
+        placeholder = [{"role": "user", "content": "-"}]
+        full = self.tokenizer.apply_chat_template([message] + placeholder, tokenize=False, add_generation_prompt=False)
+        tail = self.tokenizer.apply_chat_template(placeholder, tokenize=False, add_generation_prompt=False)
+        return full[:len(full) - len(tail)]
+    
+    def _get_turn_ids(self, role, content):
+        """Token ids for one chat turn, cached so history turns are only rendered once"""
+        key = (role, content)
+        turn_ids = self._turn_ids_cache.get(key)
+        if turn_ids is None:
+            turn_ids = self.tokenizer.encode(self._render_turn({"role": role, "content": content}), add_special_tokens=False)
+            
+            if len(self._turn_ids_cache) >= TURN_IDS_CACHE_SIZE:
+                self._turn_ids_cache.pop(next(iter(self._turn_ids_cache)))
+            self._turn_ids_cache[key] = turn_ids
+        return turn_ids
+    
+    def _get_generation_prompt_ids(self):
+        """Token ids the template appends to cue the assistant reply (rendered once)"""
+        if self._generation_prompt_ids is None:
+            placeholder = {"role": "user", "content": "-"}
+            with_prompt = self.tokenizer.apply_chat_template([placeholder], tokenize=False, add_generation_prompt=True)
+            self._generation_prompt_ids = self.tokenizer.encode(
+                with_prompt[len(self._render_turn(placeholder)):], add_special_tokens=False
+            )
+        return self._generation_prompt_ids
+    
+    def _precompute_system_prefixes(self):
+        """Tokenize the system turn of every supported language once, at load time"""
+        from utils.language_support import language_manager
+        for code in language_manager.get_supported_languages():
+            self.pin_system_prompt(language_manager.get_system_prompt(code))
+        logger.info(f"Precomputed system prompt ids for {len(self._system_prefix_ids)} language(s)")
+    
+    def pin_system_prompt(self, system_message):
+        """
+        Tokenize a system prompt once and keep its ids for good - for fixed
+        system_prompt_override strings (e.g. the hint prompt) that would
+        otherwise compete with history turns in the turn-ids cache.
+        """
+        if system_message not in self._system_prefix_ids:
+            self._system_prefix_ids[system_message] = self._get_turn_ids("system", system_message)
+    
+    def _get_system_prefix_ids(self, system_message):
+        """Token ids for the system turn (precomputed per language, cached for overrides)"""
+        prefix_ids = self._system_prefix_ids.get(system_message)
+        if prefix_ids is None:
+            prefix_ids = self._get_turn_ids("system", system_message)
+        return prefix_ids
+    
+    def _get_system_past(self, system_message):
+        """
+        KV cache for the system turn, computed once per system prompt.
+        
+        Returns a copy since generate() extends the cache in place.
+        Returns None if the prefix forward pass fails (generation then
+        just prefills the full prompt).
+        """
+        torch = self._get_torch()
+        
+        past = self._system_past_cache.get(system_message)
+        if past is None:
+            prefix_ids = self._get_system_prefix_ids(system_message)
+            try:
+                with torch.no_grad():
+                    out = self.model(torch.tensor([prefix_ids], device=self.device), use_cache=True)
+                past = out.past_key_values
+            except Exception as e:
+                logger.warning(f"System prompt KV cache unavailable: {e}")
+                return None
+            
+            if len(self._system_past_cache) >= SYSTEM_PAST_CACHE_SIZE:
+                self._system_past_cache.pop(next(iter(self._system_past_cache)))
+            self._system_past_cache[system_message] = past
+            logger.info(f"Cached system prompt KV ({len(prefix_ids)} tokens)")
+        return copy.deepcopy(past)
+    
     def format_prompt(self, user_message, system_message=None, conversation_history=None, language_code='en'):
         """
-        Format message for Phi 3.5 chat template with optional conversation history.
+        Build input ids for the Phi 3.5 chat template with optional conversation history.
+        
+        Turns are tokenized individually and cached, so only messages not seen
+        before (normally just the new user message) go through the chat
+        template and tokenizer; the rest is token id concatenation.
         
         Args:
             user_message (str): Current user message
             system_message (str, optional): System prompt (will be overridden by language-specific prompt)
             conversation_history (list, optional): List of previous message dicts
             language_code (str, optional): Language code for system prompt
+        
+        Returns:
+            list: Prompt token ids
         """
         # Get language-specific system prompt if no custom system message provided
         if system_message is None:
             from utils.language_support import language_manager
             system_message = language_manager.get_system_prompt(language_code)
-
-        messages = [{"role": "system", "content": system_message}]
+        
+        input_ids = list(self._get_system_prefix_ids(system_message))
         
         # Add conversation history if provided (last 3 Q&A pairs)
+        for message in conversation_history or ():
+            input_ids += self._get_turn_ids(message["role"], message["content"])
+        
+        # Add current user message (cached too - it's next turn's history)
+        input_ids += self._get_turn_ids("user", user_message)
+        input_ids += self._get_generation_prompt_ids()
+        
+        # Limit input to prevent OOM (leave room for response)
+        return input_ids[:Config.MAX_LENGTH]
+    
+    def _generate_batch(self, requests, gen_kwargs):
+        """
+        Run one generate() call for prompts sharing the same sampling settings.
+        Only called from the batcher thread, which owns the input buffers.
+        
+        Args:
+            requests (list): (prompt_ids, system_message) pairs
+            gen_kwargs (dict): max_new_tokens, temperature, top_p and optionally
+                stop_at_sentence / streamer
+        
+        Returns:
+            list: Generated token ids for each request
+        """
+        torch = self._get_torch()
+        batch_size = len(requests)
+        max_len = max(len(ids) for ids, _ in requests)
+        
+        gen_kwargs = dict(gen_kwargs)
+        if gen_kwargs.pop('stop_at_sentence', False):
+            # Short answers only keep their first sentence - stop decoding there
+            gen_kwargs['stopping_criteria'] = self._get_sentence_stopper()
+        
+        # Left-pad into the reusable host buffers so every row ends at its generation prompt
+        ids_buf = self._input_ids_np
+        mask_buf = self._attention_mask_np
+        for row, (ids, _) in enumerate(requests):
+            pad = max_len - len(ids)
+            ids_buf[row, :pad] = self.tokenizer.pad_token_id
+            ids_buf[row, pad:max_len] = ids
+            mask_buf[row, :pad] = 0
+            mask_buf[row, pad:max_len] = 1
+        
+        inputs = self._copy_inputs_to_device(
+            input_ids=self._input_ids_buf[:batch_size, :max_len],
+            attention_mask=self._attention_mask_buf[:batch_size, :max_len]
+        )
+        
+        # Generate with Intel XPU optimization
+        log_timing = logger.isEnabledFor(logging.INFO)
+        if log_timing:
+            start_time = time.perf_counter()
+        
+        # Sampling settings go through a cached GenerationConfig; only per-call
+        # objects (stopping criteria, streamer) stay as generate() kwargs
+        max_new_tokens = gen_kwargs.pop('max_new_tokens')
+        temperature = gen_kwargs.pop('temperature')
+        top_p = gen_kwargs.pop('top_p')
+        while True:
+            generate_kwargs = dict(
+                gen_kwargs,
+                generation_config=self._get_generation_config(max_new_tokens, temperature, top_p)
+            )
+            past_key_values, static_cache = self._build_past(requests, max_len, max_new_tokens)
+            try:
+                outputs = self._run_generate(inputs, past_key_values, static_cache, generate_kwargs)
+                break
+            except RuntimeError as e:  # torch OutOfMemoryError subclasses RuntimeError
+                if 'out of memory' not in str(e).lower() or max_new_tokens <= OOM_MIN_NEW_TOKENS:
+                    raise
+                # Only now hand cached blocks back to the driver, then retry with a smaller budget
+                past_key_values = None
+                if self.device == 'xpu':
+                    torch.xpu.empty_cache()
+                max_new_tokens //= 2
+                logger.warning(f"XPU out of memory - retrying with max_new_tokens={max_new_tokens}")
+        
+        # One device->host transfer straight to lists of ids (this is also the device sync point)
+        new_ids = outputs[:, max_len:].tolist()
+        
+        if log_timing:
+            generation_time = max(time.perf_counter() - start_time, 1e-6)
+            tokens_generated = outputs.shape[1] - max_len
+            logger.info("Generated %d tokens x %d request(s) in %.2fs (%.2f tok/s)",
+                        tokens_generated, batch_size, generation_time,
+                        tokens_generated * batch_size / generation_time)
+        
+        return new_ids
+    
+    def _get_generation_config(self, max_new_tokens, temperature, top_p):
+        """
+        GenerationConfig for these sampling settings, built once and reused so
+        generate() doesn't merge and validate the sampling kwargs on every call.
+        Only a handful of distinct settings occur (one per question bucket).
+        temperature 0.0 means greedy decoding (argmax, no softmax/top-p/multinomial).
+        """
+        key = (max_new_tokens, temperature, top_p)
+        generation_config = self._generation_configs.get(key)
+        if generation_config is None:
+            from transformers import GenerationConfig
+            if temperature > 0.0:
+                sampling = dict(do_sample=True, temperature=temperature, top_p=top_p, repetition_penalty=1.1)
+            else:
+                sampling = dict(do_sample=False)
+            generation_config = GenerationConfig(
+                max_new_tokens=max_new_tokens,
+                **sampling,
+                pad_token_id=self.tokenizer.eos_token_id,
+                eos_token_id=self.tokenizer.eos_token_id,
+                use_cache=True,
+                output_scores=False,
+                return_dict_in_generate=False  # Plain tensor out, no ModelOutput wrapper
+            )
+            
+            if len(self._generation_configs) >= GENERATION_CONFIG_CACHE_SIZE:
+                self._generation_configs.pop(next(iter(self._generation_configs)))
+            self._generation_configs[key] = generation_config
+        return generation_config
+    
+    def _canned_reply(self, user_message, language_code):
+        """Canned reply for bare greetings (English only - other languages need the model)"""
+        if language_code != 'en':
+            return None
+        return self._CANNED_RESPONSES.get(user_message.lower().strip().rstrip('!.?'))
+    
+    def _prepare_request(self, user_message, max_new_tokens, temperature, top_p, conversation_history, language_code, system_prompt_override):
+        """
+        Classify the question, pick generation limits and build the prompt.
+        
+        Returns:
+            tuple: (prompt_ids, system_message, gen_kwargs, first_sentence_only)
+        """
+        # Smart token limiting based on question complexity - one scan yields
+        # the word count and the greeting/math/explanation flags
+        question_words = 0
+        kinds = set()
+        for m in self._CLASSIFY_RE.finditer(user_message.lower()):
+            if m.lastgroup == 'word':
+                question_words += 1
+            else:
+                kinds.add(m.lastgroup)
+        
+        # Detect greetings and simple responses - FORCE LOW TEMPERATURE
+        is_greeting = question_words <= 5 and 'greet' in kinds
+        simple_math = 'math' in kinds
+        asks_explanation = 'explain' in kinds
+        
+        if is_greeting:
+            max_new_tokens = 50   # Very short for greetings
+            temperature = 0.0     # Greedy = no rambling, and no sampling kernels
+        elif simple_math and question_words <= 15:  # Simple math questions
+            max_new_tokens = 50   # Very short answers
+            temperature = 0.0     # Greedy - one argmax per token
+        elif question_words <= 10:  # Short questions
+            max_new_tokens = min(max_new_tokens, 200)
+            temperature = 0.3     # Low temperature for focused answers
+        elif question_words <= 25:  # Medium questions
+            max_new_tokens = min(max_new_tokens, 400)
+            temperature = 0.5
+        else:  # Complex/hard questions (25+ words) - allow detailed explanations
+            max_new_tokens = min(max_new_tokens, 1024)  # Allow longer explanations
+            temperature = min(temperature, 0.7)  # Use user's temperature but cap at 0.7
+        
+        logger.info("Question words: %d, Max tokens: %d", question_words, max_new_tokens)
         if conversation_history:
-            messages.extend(conversation_history)
+            logger.info("Using conversation history: %d previous Q&A pairs", len(conversation_history) // 2)
         
-        # Add current user message
-        messages.append({"role": "user", "content": user_message})
+        # For simple, one-off questions, treat them as fresh instructions by ignoring history
+        # BUT keep history if asking for explanation (needs context for "that", "it", etc.)
+        final_conversation_history = conversation_history
+        
+        # Only ignore history if it's truly standalone (not an explanation request)
+        if (simple_math and not asks_explanation) or is_greeting:
+            # Check if there's recent history - if yes, might be a follow-up
+            if conversation_history and len(conversation_history) > 0:
+                # Has history - might be "explain that" or similar, so keep history
+                logger.info("Simple question with history detected - keeping context in case it's a follow-up")
+            else:
+                # No history - definitely standalone, treat as direct instruction
+                final_conversation_history = None
+                logger.info("Standalone simple question - treating as direct instruction (no history)")
+        
+        # Use override if provided, otherwise the language-specific prompt
+        system_message = system_prompt_override
+        if system_message is None:
+            from utils.language_support import language_manager
+            system_message = language_manager.get_system_prompt(language_code)
         
-        return self.tokenizer.apply_chat_template(
-            messages, 
-            tokenize=False, 
-            add_generation_prompt=True
+        # Build input ids with conversation history and language
+        prompt_ids = self.format_prompt(
+            user_message, 
+            conversation_history=final_conversation_history, 
+            language_code=language_code,
+            system_message=system_message
         )
+        logger.info("Input tokens: %d", len(prompt_ids))
+        
+        # Truncate rambling ONLY for truly simple questions (no explanation request)
+        first_sentence_only = not asks_explanation and ((simple_math and question_words <= 10) or is_greeting)
+        
+        gen_kwargs = {
+            'max_new_tokens': max_new_tokens,
+            'temperature': temperature,
+            'top_p': top_p,
+            'stop_at_sentence': first_sentence_only
+        }
+        
+        return prompt_ids, system_message, gen_kwargs, first_sentence_only
+    
+    @staticmethod
+    def _first_sentence(response):
+        """Cut a short-answer response down to its first sentence/line"""
+        sentences = response.split('.')
+        if len(sentences) > 1 and len(sentences[0]) < 100:
+            response = sentences[0] + '.'
+        if '\n' in response:
+            response = response.split('\n')[0].strip()
+        return response
     
     def generate_response(self, user_message, max_new_tokens=768, temperature=0.7, top_p=0.9, conversation_history=None, language_code='en', system_prompt_override=None):
         """
@@ -194,132 +811,80 @@ class PhiTutor:
             language_code (str, optional): Language code for response
             system_prompt_override (str, optional): Override system prompt (for lesson-specific contexts)
         """
-        # Import torch locally
-        import torch
-        
         if not self.is_loaded:
             return "Error: Model not loaded. Please wait while the model initializes."
         
         try:
-            # Smart token limiting based on question complexity
-            question_words = len(user_message.strip().split())
-            question_lower = user_message.lower().strip()
+            canned = self._canned_reply(user_message, language_code)
+            if canned:
+                logger.info("Greeting answered from canned responses")
+                return canned
             
-            # Detect greetings and simple responses - FORCE LOW TEMPERATURE
-            greetings = ['hello', 'hi', 'hey', 'thanks', 'thank you', 'bye', 'goodbye']
-            simple_math = any(op in question_lower for op in ['+', '-', '*', '/', 'plus', 'minus', 'times', 'divided'])
-            asks_explanation = any(word in question_lower for word in ['explain', 'how', 'why', 'tell me', 'describe', 'what is', 'show me'])
-            
-            if any(greeting in question_lower for greeting in greetings) and question_words <= 5:
-                max_new_tokens = 50   # Very short for greetings
-                temperature = 0.1     # Almost deterministic = no rambling
-            elif simple_math and question_words <= 15:  # Simple math questions
-                max_new_tokens = 50   # Very short answers
-                temperature = 0.1     # Almost deterministic
-            elif question_words <= 10:  # Short questions
-                max_new_tokens = min(max_new_tokens, 200)
-                temperature = 0.3     # Low temperature for focused answers
-            elif question_words <= 25:  # Medium questions
-                max_new_tokens = min(max_new_tokens, 400)
-                temperature = 0.5
-            else:  # Complex/hard questions (25+ words) - allow detailed explanations
-                max_new_tokens = min(max_new_tokens, 1024)  # Allow longer explanations
-                temperature = min(temperature, 0.7)  # Use user's temperature but cap at 0.7
-            
-            logger.info(f"Question words: {question_words}, Max tokens: {max_new_tokens}")
-            if conversation_history:
-                logger.info(f"Using conversation history: {len(conversation_history)//2} previous Q&A pairs")
-            
-            # For simple, one-off questions, treat them as fresh instructions by ignoring history
-            # BUT keep history if asking for explanation (needs context for "that", "it", etc.)
-            final_conversation_history = conversation_history
-            
-            # Only ignore history if it's truly standalone (not an explanation request)
-            if (simple_math and not asks_explanation) or (any(g in question_lower for g in greetings) and question_words <= 5):
-                # Check if there's recent history - if yes, might be a follow-up
-                if conversation_history and len(conversation_history) > 0:
-                    # Has history - might be "explain that" or similar, so keep history
-                    logger.info("Simple question with history detected - keeping context in case it's a follow-up")
-                else:
-                    # No history - definitely standalone, treat as direct instruction
-                    final_conversation_history = None
-                    logger.info("Standalone simple question - treating as direct instruction (no history)")
-            
-            # Format prompt with conversation history and language
-            prompt = self.format_prompt(
-                user_message, 
-                conversation_history=final_conversation_history, 
-                language_code=language_code,
-                system_message=system_prompt_override  # Use override if provided
+            prompt_ids, system_message, gen_kwargs, first_sentence_only = self._prepare_request(
+                user_message, max_new_tokens, temperature, top_p,
+                conversation_history, language_code, system_prompt_override
             )
             
-            # Tokenize (limit input to prevent OOM)
-            inputs = self.tokenizer(
-                prompt, 
-                return_tensors="pt", 
-                truncation=True, 
-                max_length=3072  # Leave room for response
-            ).to(self.device)
+            # Queue for the batcher - concurrent requests share one generate() call
+            response_ids = self._batcher.submit(prompt_ids, system_message, gen_kwargs).result()
             
-            logger.info(f"Input tokens: {inputs['input_ids'].shape[1]}")
+            response = self.tokenizer.decode(response_ids, skip_special_tokens=True).strip()
             
-            # Generate with Intel XPU optimization
-            start_time = time.time()
-            
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=max_new_tokens,
-                    do_sample=True,
-                    temperature=temperature,
-                    top_p=top_p,
-                    repetition_penalty=1.1,
-                    pad_token_id=self.tokenizer.eos_token_id,
-                    eos_token_id=self.tokenizer.eos_token_id
-                    # use_cache removed - compatibility issue with transformers 4.49.0
-                )
-            
-            generation_time = time.time() - start_time
-            tokens_generated = outputs.shape[1] - inputs['input_ids'].shape[1]
+            # Post-process: truncate rambling ONLY for simple questions (not explanations)
+            if first_sentence_only:
+                response = self._first_sentence(response)
             
-            # Decode response
-            response = self.tokenizer.decode(
-                outputs[0][inputs['input_ids'].shape[1]:], 
-                skip_special_tokens=True
-            ).strip()
+            return response.strip()
             
-            # Post-process: truncate rambling ONLY for simple questions (not explanations)
-            asks_explanation = any(word in question_lower for word in ['explain', 'how', 'why', 'tell me', 'describe', 'what is', 'show me'])
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            return f"Sorry, I encountered an error: {str(e)}"
+    
+    def stream_response(self, user_message, max_new_tokens=768, temperature=0.7, top_p=0.9, conversation_history=None, language_code='en', system_prompt_override=None):
+        """
+        Generate AI tutor response, yielding text chunks as tokens are decoded.
+        
+        Same arguments as generate_response(). Generation still runs on the
+        batcher thread (alone, since a streamer is per-request), so GPU access
+        stays serialized with regular requests.
+        """
+        if not self.is_loaded:
+            yield "Error: Model not loaded. Please wait while the model initializes."
+            return
+        
+        try:
+            canned = self._canned_reply(user_message, language_code)
+            if canned:
+                logger.info("Greeting answered from canned responses")
+                yield canned
+                return
             
-            # Only truncate if it's truly a simple question with no explanation request
-            if not asks_explanation:
-                if simple_math and question_words <= 10:
-                    # Simple math with no explanation - truncate aggressively
-                    sentences = response.split('.')
-                    if len(sentences) > 1 and len(sentences[0]) < 100:
-                        response = sentences[0] + '.'
-                    if '\n' in response:
-                        response = response.split('\n')[0].strip()
-                elif any(g in question_lower for g in greetings) and question_words <= 5:
-                    # Greetings - truncate to first sentence
-                    sentences = response.split('.')
-                    if len(sentences) > 1 and len(sentences[0]) < 100:
-                        response = sentences[0] + '.'
-                    if '\n' in response:
-                        response = response.split('\n')[0].strip()
+            prompt_ids, system_message, gen_kwargs, first_sentence_only = self._prepare_request(
+                user_message, max_new_tokens, temperature, top_p,
+                conversation_history, language_code, system_prompt_override
+            )
             
-            logger.info(f"Generated {tokens_generated} tokens in {generation_time:.2f}s ({tokens_generated/generation_time:.2f} tok/s)")
+            from transformers import TextIteratorStreamer
+            streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+            future = self._batcher.submit(prompt_ids, system_message, {**gen_kwargs, 'streamer': streamer})
+            # generate() only closes the streamer on success - close it on failure too
+            future.add_done_callback(lambda f: f.exception() is not None and streamer.end())
             
-            # Clean up memory
-            del inputs, outputs
-            if self.device == 'xpu':
-                torch.xpu.empty_cache()
+            for chunk in streamer:
+                if first_sentence_only:
+                    # Stop at the first sentence/line for simple questions
+                    match = self._SENTENCE_END_RE.search(chunk)
+                    if match:
+                        yield chunk[:match.end()] if match.group() == '.' else chunk[:match.start()]
+                        break
+                yield chunk
             
-            return response.strip()
+            if future.done() and future.exception() is not None:
+                raise future.exception()
             
         except Exception as e:
-            logger.error(f"Error generating response: {e}")
-            return f"Sorry, I encountered an error: {str(e)}"
+            logger.error(f"Error streaming response: {e}")
+            yield f"Sorry, I encountered an error: {str(e)}"
     
     def get_model_info(self):
         """Get model information"""
@@ -330,13 +895,12 @@ class PhiTutor:
             "status": "loaded",
             "model": Config.MODEL_NAME,
             "device": str(self.device),
-            "tokenizer_vocab_size": len(self.tokenizer)
+            "tokenizer_vocab_size": len(self.tokenizer),
+            **self._static_info
         }
         
         if self.device == 'xpu':
-            # Import torch locally
-            import torch
-            info["xpu_name"] = torch.xpu.get_device_name(0)
+            torch = self._get_torch()
             info["xpu_memory_allocated_gb"] = torch.xpu.memory_allocated(0) / 1024**3
         
         return info
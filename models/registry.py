@@ -0,0 +1,114 @@
+"""
+Model Registry - LRU-bounded cache of loaded model instances
+Keeps recently used models resident in VRAM so switching back and forth
+(e.g. Mistral <-> Phi) doesn't pay the 30-60s reload cost every time.
+
+Models are only unloaded when the cache is full (memory pressure), never on
+a plain switch.
+"""
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough VRAM budget per resident model, used to size the cache from device memory
+MODEL_VRAM_BUDGET_GB = 6
+
+
+class ModelRegistry:
+    """
+    Keeps up to `maxsize` models loaded, evicting the least recently used one.
+    Keyed by model key (e.g. 'mistral-7b-v0.2') - model keys that share a class
+    each get their own instance.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None):
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._maxsize = maxsize
+
+    @property
+    def maxsize(self) -> int:
+        """Number of models allowed to stay resident (detected on first use)"""
+        if self._maxsize is None:
+            self._maxsize = self._detect_maxsize()
+            logger.info(f"Model registry holds up to {self._maxsize} resident model(s)")
+        return self._maxsize
+
+    @staticmethod
+    def _detect_maxsize() -> int:
+        """Size the cache from total XPU memory (1 model if XPU unavailable)"""
+        # Import torch locally - importing at module level auto-loads IPEX in PyTorch 2.6!
+        try:
+            import torch
+            if hasattr(torch, 'xpu') and torch.xpu.is_available():
+                total_memory = torch.xpu.get_device_properties(0).total_memory
+                return max(1, int(total_memory // (MODEL_VRAM_BUDGET_GB * 1024**3)))
+        except Exception as e:
+            logger.warning(f"Could not query XPU memory for model registry: {e}")
+        return 1
+
+    def get(self, key: str, cls: type, config: Any) -> Any:
+        """
+        Get the loaded model for `key`, instantiating `cls` and loading it on a miss.
+
+        Args:
+            key: Model key the instance is cached under
+            cls: Model class to instantiate on a miss
+            config: Configuration passed to the constructor on a miss
+
+        Returns:
+            Loaded model instance
+        """
+        model = self._models.get(key)
+        if model is not None and model.is_loaded:
+            self._models.move_to_end(key)
+            logger.info(f"Model registry hit: {key}")
+            return model
+
+        # Make room before loading so peak VRAM never exceeds the budget
+        self._models.pop(key, None)
+        while self._models and len(self._models) >= self.maxsize:
+            self._evict_oldest()
+
+        model = cls(config)
+        # Models with __init__ that auto-loads won't need explicit load_model()
+        if not model.is_loaded and hasattr(model, 'load_model'):
+            model.load_model()
+
+        self._models[key] = model
+        return model
+
+    def is_loaded(self, key: str) -> bool:
+        """Check if a loaded model for `key` is resident"""
+        model = self._models.get(key)
+        return model is not None and model.is_loaded
+
+    def evict(self, key: str) -> None:
+        """Unload and drop the model for `key`, if resident"""
+        model = self._models.pop(key, None)
+        if model is not None:
+            logger.info(f"Evicting {key} from model registry")
+            model.unload()
+
+    def _evict_oldest(self) -> None:
+        """Unload the least recently used model"""
+        key, model = self._models.popitem(last=False)
+        logger.info(f"Evicting least recently used model: {key}")
+        model.unload()
+
+    def clear(self) -> None:
+        """Unload all resident models"""
+        while self._models:
+            self._evict_oldest()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get registry status"""
+        return {
+            'maxsize': self._maxsize,
+            'resident': list(self._models)
+        }
+
+
+# Global registry instance
+model_registry = ModelRegistry()
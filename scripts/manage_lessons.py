@@ -3,27 +3,144 @@ Lesson Management Script
 Add new lessons to the Xilo AI Tutor system
 """
 import json
+import mmap
 import os
+import sys
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson  # Optional: several times faster JSON encode/decode
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack  # Optional: binary copy of metadata.json that decodes faster than JSON
+except ImportError:
+    msgpack = None
 
 # Base paths
 BASE_DIR = Path(__file__).parent.parent
 LESSONS_DIR = BASE_DIR / "lessons"
 METADATA_FILE = LESSONS_DIR / "metadata.json"
+METADATA_SIDECAR = METADATA_FILE.with_suffix('.msgpack')  # Regenerated from metadata.json, never edited
+
+# String forms for per-lesson path building (os.path.join avoids Path object overhead)
+_BASE_STR = str(BASE_DIR)
+_LESSONS_STR = str(LESSONS_DIR)
+
+# Parsed metadata.json (and its flattened lesson index), reused while the file's mtime is unchanged
+_META_CACHE = {"mtime": None, "data": None, "index": None}
+
+
+def _read_json_file(path):
+    """
+    Parse a JSON file. With orjson the file is memory-mapped and parsed
+    straight from the page cache; stdlib json needs a bytes copy.
+    """
+    if orjson is None:
+        return json.loads(path.read_bytes())
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as view:  # Released before the map closes
+            return orjson.loads(view)
+
+
+def _json_dumps(obj):
+    """Serialize to indented UTF-8 JSON bytes (orjson if installed)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def _write_atomic(path, payload):
+    """Write bytes to a sibling temp file in one go, then swap it in - a crash never leaves a torn file"""
+    tmp_file = path.with_name(path.name + '.tmp')
+    with open(tmp_file, 'wb', buffering=1 << 20) as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+def _read_metadata_sidecar(json_mtime):
+    """Decode metadata.msgpack if it is at least as new as metadata.json (None otherwise)"""
+    if msgpack is None:
+        return None
+    try:
+        if os.stat(METADATA_SIDECAR).st_mtime_ns < json_mtime:
+            return None
+        with open(METADATA_SIDECAR, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return msgpack.unpackb(mm, raw=False)
+    except (OSError, ValueError):  # Missing, empty or corrupt - fall back to the JSON
+        return None
+
+
+def _write_metadata_sidecar(metadata):
+    """Regenerate metadata.msgpack (best effort - metadata.json stays the source of truth)"""
+    if msgpack is None:
+        return
+    try:
+        _write_atomic(METADATA_SIDECAR, msgpack.packb(metadata, use_bin_type=True))
+    except OSError as e:
+        print(f"⚠️  Could not write {METADATA_SIDECAR}: {e}")
 
 
 def load_metadata():
-    """Load the metadata.json file"""
-    with open(METADATA_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """
+    Load the metadata.json file (cached until the file changes on disk).
+    The returned dict is shared - save_metadata() after changing it.
+    """
+    mtime = os.stat(METADATA_FILE).st_mtime_ns
+    if _META_CACHE["mtime"] == mtime:
+        return _META_CACHE["data"]
+    
+    data = _read_metadata_sidecar(mtime)
+    if data is None:
+        data = _read_json_file(METADATA_FILE)
+        _write_metadata_sidecar(data)
+    _META_CACHE.update(mtime=mtime, data=data, index=None)
+    return data
+
+
+def _lesson_index():
+    """
+    Flattened (grade_id, grade_name, subject_id, subject_name, title, lesson_id,
+    difficulty, minutes, file) rows for the cached metadata, built once per version.
+    Empty subjects/grades get one row with the missing fields set to None.
+    """
+    if _META_CACHE["index"] is None:
+        rows = []
+        for grade_id, grade_data in load_metadata()['grades'].items():
+            grade_row = (grade_id, grade_data['name'])
+            if not grade_data['subjects']:
+                rows.append(grade_row + (None,) * 7)
+            for subject_id, subject_data in grade_data['subjects'].items():
+                subject_row = grade_row + (subject_id, subject_data['name'])
+                if not subject_data['lessons']:
+                    rows.append(subject_row + (None,) * 5)
+                rows.extend(
+                    subject_row + (lesson['title'], lesson['id'], lesson['difficulty'],
+                                   lesson['estimated_time_minutes'], lesson['file'])
+                    for lesson in subject_data['lessons']
+                )
+        _META_CACHE["index"] = rows
+    return _META_CACHE["index"]
+
+
+def _missing_lesson_files(files):
+    """Subset of lesson file paths (relative to BASE_DIR) that don't exist, stat'ed in parallel"""
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        exists = list(executor.map(lambda file: os.path.exists(os.path.join(_BASE_STR, file)), files))
+    return {file for file, ok in zip(files, exists) if not ok}
 
 
 def save_metadata(metadata):
     """Save the metadata.json file"""
     metadata['last_updated'] = datetime.now().strftime('%Y-%m-%d')
-    with open(METADATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    _write_atomic(METADATA_FILE, _json_dumps(metadata))
+    _write_metadata_sidecar(metadata)
+    _META_CACHE.update(mtime=os.stat(METADATA_FILE).st_mtime_ns, data=metadata, index=None)
     print(f"✅ Metadata updated: {METADATA_FILE}")
 
 
@@ -75,34 +192,42 @@ def add_lesson_interactive():
     # Load metadata
     metadata = load_metadata()
     
-    # Get grade
-    print("Available grades:", ", ".join(metadata['grades'].keys()))
+    # Get grade - bind the nested dicts once instead of re-indexing from metadata.
+    # metadata is the shared cached copy, so new grades/subjects are only
+    # attached to it once the lesson is actually being saved
+    grades = metadata['grades']
+    print("Available grades:", ", ".join(grades))
     grade = input("Grade (e.g., grade_5): ").strip()
     
-    if grade not in metadata['grades']:
+    grade_entry = grades.get(grade)
+    if grade_entry is None:
         create_new = input(f"Grade '{grade}' doesn't exist. Create it? (y/n): ")
-        if create_new.lower() == 'y':
-            grade_name = input("Grade display name (e.g., Grade 5): ")
-            metadata['grades'][grade] = {
-                "name": grade_name,
-                "subjects": {}
-            }
+        if create_new.lower() != 'y':
+            print("❌ A lesson needs an existing grade. Nothing was added.")
+            return
+        grade_name = input("Grade display name (e.g., Grade 5): ")
+        grade_entry = {
+            "name": grade_name,
+            "subjects": {}
+        }
     
     # Get subject
-    if grade in metadata['grades']:
-        subjects = metadata['grades'][grade]['subjects']
-        print(f"Available subjects in {grade}:", ", ".join(subjects.keys()) if subjects else "None")
+    subjects = grade_entry['subjects']
+    print(f"Available subjects in {grade}:", ", ".join(subjects) if subjects else "None")
     
     subject = input("Subject (e.g., math, english, science): ").strip()
     
-    if subject not in metadata['grades'][grade]['subjects']:
+    subject_entry = subjects.get(subject)
+    if subject_entry is None:
         create_new = input(f"Subject '{subject}' doesn't exist. Create it? (y/n): ")
-        if create_new.lower() == 'y':
-            subject_name = input("Subject display name (e.g., Mathematics): ")
-            metadata['grades'][grade]['subjects'][subject] = {
-                "name": subject_name,
-                "lessons": []
-            }
+        if create_new.lower() != 'y':
+            print("❌ A lesson needs an existing subject. Nothing was added.")
+            return
+        subject_name = input("Subject display name (e.g., Mathematics): ")
+        subject_entry = {
+            "name": subject_name,
+            "lessons": []
+        }
     
     # Get lesson info
     lesson_id = input("Lesson ID (e.g., fractions_basic): ").strip()
@@ -112,8 +237,8 @@ def add_lesson_interactive():
     time_minutes = int(time_minutes) if time_minutes else 30
     
     # Create lesson file
-    lesson_file_path = LESSONS_DIR / grade / subject / f"{lesson_id}.json"
-    lesson_file_path.parent.mkdir(parents=True, exist_ok=True)
+    lesson_file_path = os.path.join(_LESSONS_STR, grade, subject, f"{lesson_id}.json")
+    os.makedirs(os.path.dirname(lesson_file_path), exist_ok=True)
     
     # Create lesson from template
     lesson = create_lesson_template()
@@ -124,9 +249,13 @@ def add_lesson_interactive():
     lesson['difficulty'] = difficulty
     lesson['estimated_time_minutes'] = time_minutes
     
-    # Save lesson file
-    with open(lesson_file_path, 'w', encoding='utf-8') as f:
-        json.dump(lesson, f, indent=2, ensure_ascii=False)
+    # Save lesson file - serialized once, written with a single syscall
+    # (O_BINARY keeps Windows from translating newlines on the raw fd)
+    fd = os.open(lesson_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        os.write(fd, _json_dumps(lesson))
+    finally:
+        os.close(fd)
     
     print(f"\n✅ Lesson file created: {lesson_file_path}")
     print(f"⚠️  Please edit the file to add content, sections, and questions!")
@@ -141,7 +270,9 @@ def add_lesson_interactive():
         "prerequisites": []
     }
     
-    metadata['grades'][grade]['subjects'][subject]['lessons'].append(lesson_entry)
+    subject_entry['lessons'].append(lesson_entry)
+    subjects[subject] = subject_entry
+    grades[grade] = grade_entry
     save_metadata(metadata)
     
     print("\n✅ Lesson added successfully!")
@@ -150,35 +281,46 @@ def add_lesson_interactive():
 
 def list_lessons():
     """List all lessons in the system"""
-    metadata = load_metadata()
-    
-    print("\n" + "="*50)
-    print("📚 All Lessons in Xilo AI Tutor")
-    print("="*50 + "\n")
+    load_metadata()
+    rows = _lesson_index()
+    missing = _missing_lesson_files([row[-1] for row in rows if row[-1] is not None])
     
-    for grade_id, grade_data in metadata['grades'].items():
-        print(f"\n{grade_data['name']} ({grade_id})")
-        print("-" * 40)
+    # Whole listing goes out in one stdout write
+    lines = ["\n" + "="*50, "📚 All Lessons in Xilo AI Tutor", "="*50 + "\n"]
+    prev_grade = prev_subject = None
+    for grade_id, grade_name, subject_id, subject_name, title, lesson_id, difficulty, minutes, file in rows:
+        if grade_id != prev_grade:
+            lines += [f"\n{grade_name} ({grade_id})", "-" * 40]
+            prev_grade, prev_subject = grade_id, None
+        if subject_id is None:
+            continue
         
-        for subject_id, subject_data in grade_data['subjects'].items():
-            if subject_data['lessons']:
-                print(f"\n  {subject_data['name']}:")
-                for lesson in subject_data['lessons']:
-                    print(f"    • {lesson['title']} ({lesson['id']})")
-                    print(f"      Difficulty: {lesson['difficulty']} | Time: {lesson['estimated_time_minutes']} min")
-            else:
-                print(f"\n  {subject_data['name']}: No lessons yet")
+        if subject_id != prev_subject:
+            lines.append(f"\n  {subject_name}:" if title is not None else f"\n  {subject_name}: No lessons yet")
+            prev_subject = subject_id
+        if title is not None:
+            lines.append(f"    • {title} ({lesson_id})")
+            lines.append(f"      Difficulty: {difficulty} | Time: {minutes} min")
+            if file in missing:
+                lines.append(f"      ⚠️  Lesson file missing: {file}")
+    
+    if missing:
+        lines.append(f"\n⚠️  {len(missing)} lesson file(s) listed in metadata are missing")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main():
     """Main menu"""
+    menu = "\n".join([
+        "\n" + "="*50,
+        "📚 Xilo Lesson Management",
+        "="*50,
+        "1. Add new lesson",
+        "2. List all lessons",
+        "3. Exit"
+    ]) + "\n"
     while True:
-        print("\n" + "="*50)
-        print("📚 Xilo Lesson Management")
-        print("="*50)
-        print("1. Add new lesson")
-        print("2. List all lessons")
-        print("3. Exit")
+        sys.stdout.write(menu)
         
         choice = input("\nChoose an option: ").strip()
         
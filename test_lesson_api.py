@@ -4,58 +4,78 @@ Run this with the Flask server running
 """
 import requests
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_URL = "http://localhost:5000"
 
-def test_api(endpoint, method="GET", data=None):
+# One keep-alive connection for every test call
+SESSION = requests.Session()
+
+# Concurrent tests print their whole block at once so output doesn't interleave
+_PRINT_LOCK = threading.Lock()
+
+def test_api(endpoint, method="GET", data=None, title=None):
     """Helper to test API endpoints"""
     url = f"{BASE_URL}{endpoint}"
-    print(f"\n{'='*60}")
-    print(f"{method} {endpoint}")
-    print('='*60)
+    lines = [f"\n{title}"] if title else []
+    lines += [f"\n{'='*60}", f"{method} {endpoint}", '='*60]
+    result = None
     
     try:
         if method == "GET":
-            response = requests.get(url)
+            response = SESSION.get(url)
         else:
-            response = requests.post(url, json=data)
+            response = SESSION.post(url, json=data)
         
-        print(f"Status: {response.status_code}")
+        lines.append(f"Status: {response.status_code}")
         result = response.json()
-        print(f"Response: {json.dumps(result, indent=2)}")
-        return result
+        lines.append(f"Response: {json.dumps(result, indent=2)}")
     except Exception as e:
-        print(f"❌ Error: {e}")
-        return None
+        lines.append(f"❌ Error: {e}")
+    
+    with _PRINT_LOCK:
+        print("\n".join(lines))
+    return result
+
+def run_concurrently(calls, max_workers=8):
+    """Run independent test_api calls (dicts of its kwargs) in parallel, results in order"""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda kwargs: test_api(**kwargs), calls))
 
 def main():
     print("\n" + "="*60)
     print("Testing Lesson System API Endpoints")
     print("="*60)
     
-    # Test 1: Get all grades
-    print("\n📚 Test 1: Get All Grades")
-    test_api("/api/lessons/grades")
-    
-    # Test 2: Get subjects for Grade 5
-    print("\n📚 Test 2: Get Subjects for Grade 5")
-    test_api("/api/lessons/grade_5/subjects")
+    # Tests 1-6, 8 and 10 don't depend on each other or on the model - run them concurrently
+    run_concurrently([
+        {"title": "📚 Test 1: Get All Grades", "endpoint": "/api/lessons/grades"},
+        {"title": "📚 Test 2: Get Subjects for Grade 5", "endpoint": "/api/lessons/grade_5/subjects"},
+        {"title": "📚 Test 3: Get Lessons for Grade 5 Math", "endpoint": "/api/lessons/grade_5/math"},
+        {"title": "📚 Test 4: Get Full Lesson (Fractions)", "endpoint": "/api/lessons/grade_5/math/fractions_basic"},
+        {"title": "📚 Test 5: Get Section 1", "endpoint": "/api/lessons/grade_5/math/fractions_basic/section/section_1"},
+        {"title": "📚 Test 6: Search for 'fraction'", "endpoint": "/api/lessons/search?q=fraction"},
+        {"title": "📚 Test 8: Evaluate Answer (Simple)", "endpoint": "/api/lessons/evaluate-answer", "method": "POST", "data": {
+            "grade": "grade_5",
+            "subject": "math",
+            "lesson_id": "fractions_basic",
+            "section_id": "section_1",
+            "question_id": "q1",
+            "answer": "numerator",
+            "use_ai": False
+        }},
+        {"title": "📚 Test 10: Get Hint (Level 0)", "endpoint": "/api/lessons/get-hint", "method": "POST", "data": {
+            "grade": "grade_5",
+            "subject": "math",
+            "lesson_id": "fractions_basic",
+            "section_id": "section_1",
+            "question_id": "q1",
+            "hint_level": 0
+        }}
+    ])
     
-    # Test 3: Get lessons for Grade 5 Math
-    print("\n📚 Test 3: Get Lessons for Grade 5 Math")
-    test_api("/api/lessons/grade_5/math")
-    
-    # Test 4: Get full lesson
-    print("\n📚 Test 4: Get Full Lesson (Fractions)")
-    test_api("/api/lessons/grade_5/math/fractions_basic")
-    
-    # Test 5: Get specific section
-    print("\n📚 Test 5: Get Section 1")
-    test_api("/api/lessons/grade_5/math/fractions_basic/section/section_1")
-    
-    # Test 6: Search lessons
-    print("\n📚 Test 6: Search for 'fraction'")
-    test_api("/api/lessons/search?q=fraction")
+    # Model-backed tests (7, 9) run one at a time so each response time reads cleanly
     
     # Test 7: Doubt chat (requires model to be loaded)
     print("\n📚 Test 7: Doubt Clearing Chat")
@@ -67,18 +87,6 @@ def main():
         "section_id": "section_1"
     })
     
-    # Test 8: Evaluate answer (simple)
-    print("\n📚 Test 8: Evaluate Answer (Simple)")
-    test_api("/api/lessons/evaluate-answer", "POST", {
-        "grade": "grade_5",
-        "subject": "math",
-        "lesson_id": "fractions_basic",
-        "section_id": "section_1",
-        "question_id": "q1",
-        "answer": "numerator",
-        "use_ai": False
-    })
-    
     # Test 9: Evaluate answer (AI)
     print("\n📚 Test 9: Evaluate Answer (AI)")
     test_api("/api/lessons/evaluate-answer", "POST", {
@@ -91,17 +99,6 @@ def main():
         "use_ai": True
     })
     
-    # Test 10: Get hint
-    print("\n📚 Test 10: Get Hint (Level 0)")
-    test_api("/api/lessons/get-hint", "POST", {
-        "grade": "grade_5",
-        "subject": "math",
-        "lesson_id": "fractions_basic",
-        "section_id": "section_1",
-        "question_id": "q1",
-        "hint_level": 0
-    })
-    
     print("\n" + "="*60)
     print("✅ API Testing Complete!")
     print("="*60 + "\n")
@@ -116,7 +113,7 @@ if __name__ == "__main__":
     
     try:
         # Check if server is running
-        response = requests.get(f"{BASE_URL}/api/status", timeout=2)
+        response = SESSION.get(f"{BASE_URL}/api/status", timeout=2)
         if response.status_code == 200:
             print("✅ Server is running!\n")
             main()
@@ -7,6 +7,9 @@ print("\n" + "="*60)
 print("Testing Lesson Manager")
 print("="*60)
 
+# Parse every lesson once - the lookups below are then served from the cache
+print(f"\nPrimed lesson cache: {lesson_manager.prime_cache()} lesson(s)")
+
 # Test 1: Get all grades
 print("\n1. Getting all grades:")
 grades = lesson_manager.get_all_grades()
@@ -3,30 +3,64 @@ Test Progress Tracking System
 """
 import requests
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_URL = "http://localhost:5000"
+
+# One keep-alive connection for every test call
+SESSION = requests.Session()
 USER_ID = "test_student_123"
 
-def test_api(endpoint, method="GET", data=None, params=None):
+# Concurrent tests print their whole block at once so output doesn't interleave
+_PRINT_LOCK = threading.Lock()
+
+def test_api(endpoint, method="GET", data=None, params=None, title=None):
     """Helper to test API endpoints"""
     url = f"{BASE_URL}{endpoint}"
-    print(f"\n{'='*60}")
-    print(f"{method} {endpoint}")
-    print('='*60)
+    lines = [f"\n{title}"] if title else []
+    lines += [f"\n{'='*60}", f"{method} {endpoint}", '='*60]
+    result = None
     
     try:
         if method == "GET":
-            response = requests.get(url, params=params)
+            response = SESSION.get(url, params=params)
         else:
-            response = requests.post(url, json=data)
+            response = SESSION.post(url, json=data)
         
-        print(f"Status: {response.status_code}")
+        lines.append(f"Status: {response.status_code}")
         result = response.json()
-        print(f"Response: {json.dumps(result, indent=2)[:500]}...")
-        return result
+        lines.append(f"Response: {json.dumps(result, indent=2)[:500]}...")
     except Exception as e:
-        print(f"❌ Error: {e}")
-        return None
+        lines.append(f"❌ Error: {e}")
+    
+    with _PRINT_LOCK:
+        print("\n".join(lines))
+    return result
+
+def run_concurrently(calls, max_workers=8):
+    """Run independent test_api calls (dicts of its kwargs) in parallel, results in order"""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda kwargs: test_api(**kwargs), calls))
+
+def record_answers(title, answers):
+    """
+    Record answers for the test lesson with one bulk request. Servers without
+    the bulk endpoint (404 page isn't JSON, so test_api returns None) get one
+    record-answer call per answer instead.
+    """
+    lesson = {
+        "user_id": USER_ID,
+        "grade": "grade_5",
+        "subject": "math",
+        "lesson_id": "fractions_basic"
+    }
+    result = test_api("/api/progress/record-answers-bulk", "POST", {**lesson, "answers": answers}, title=title)
+    if result is None:
+        print("↩️  Bulk endpoint unavailable - recording answers one by one")
+        for answer in answers:
+            result = test_api("/api/progress/record-answer", "POST", {**lesson, **answer})
+    return result
 
 def main():
     print("\n" + "="*60)
@@ -53,41 +87,14 @@ def main():
         "status": "in_progress"
     })
     
-    # Test 3: Record correct answer
-    print("\n📊 Test 3: Record Correct Answer (Question 1)")
-    test_api("/api/progress/record-answer", "POST", {
-        "user_id": USER_ID,
-        "grade": "grade_5",
-        "subject": "math",
-        "lesson_id": "fractions_basic",
-        "question_id": "q1",
-        "is_correct": True,
-        "hints_used": 0
-    })
-    
-    # Test 4: Record incorrect answer with hint
-    print("\n📊 Test 4: Record Incorrect Answer (Question 2)")
-    test_api("/api/progress/record-answer", "POST", {
-        "user_id": USER_ID,
-        "grade": "grade_5",
-        "subject": "math",
-        "lesson_id": "fractions_basic",
-        "question_id": "q2",
-        "is_correct": False,
-        "hints_used": 1
-    })
-    
-    # Test 5: Record correct answer after hint
-    print("\n📊 Test 5: Record Correct Answer After Hint (Question 2)")
-    test_api("/api/progress/record-answer", "POST", {
-        "user_id": USER_ID,
-        "grade": "grade_5",
-        "subject": "math",
-        "lesson_id": "fractions_basic",
-        "question_id": "q2",
-        "is_correct": True,
-        "hints_used": 1
-    })
+    # Tests 3-5 & 7: Record answers - one bulk request, applied in order
+    record_answers("📊 Tests 3-5 & 7: Record Answers (Bulk)", [
+        {"question_id": "q1", "is_correct": True, "hints_used": 0},   # Correct first try
+        {"question_id": "q2", "is_correct": False, "hints_used": 1},  # Incorrect with hint
+        {"question_id": "q2", "is_correct": True, "hints_used": 1},   # Correct after hint
+        {"question_id": "q3", "is_correct": True, "hints_used": 0},   # Section 2 questions
+        {"question_id": "q4", "is_correct": True, "hints_used": 0}
+    ])
     
     # Test 6: Complete section
     print("\n📊 Test 6: Complete Section 1")
@@ -100,19 +107,6 @@ def main():
         "status": "completed"
     })
     
-    # Test 7: Add more answers for other sections
-    print("\n📊 Test 7: Answer Questions in Section 2")
-    for i in range(3, 5):  # q3, q4
-        test_api("/api/progress/record-answer", "POST", {
-            "user_id": USER_ID,
-            "grade": "grade_5",
-            "subject": "math",
-            "lesson_id": "fractions_basic",
-            "question_id": f"q{i}",
-            "is_correct": True,
-            "hints_used": 0
-        })
-    
     # Test 8: Add study time
     print("\n📊 Test 8: Add Study Time (15 minutes)")
     test_api("/api/progress/add-time", "POST", {
@@ -141,26 +135,26 @@ def main():
         "lesson_id": "fractions_basic"
     })
     
-    # Test 11: Get subject progress
-    print("\n📊 Test 11: Get Subject Progress (Grade 5 Math)")
-    test_api("/api/progress/subject", "GET", params={
-        "user_id": USER_ID,
-        "grade": "grade_5",
-        "subject": "math"
-    })
-    
-    # Test 12: Get dashboard stats
-    print("\n📊 Test 12: Get Dashboard Stats")
-    test_api("/api/progress/dashboard", "GET", params={
-        "user_id": USER_ID
-    })
-    
-    # Test 13: Get complete user progress
-    print("\n📊 Test 13: Get Complete User Progress")
-    result = test_api("/api/progress/user", "GET", params={
-        "user_id": USER_ID
-    })
+    # Tests 11-14 only read the finished progress - run them concurrently
+    results = run_concurrently([
+        {"title": "📊 Test 11: Get Subject Progress (Grade 5 Math)", "endpoint": "/api/progress/subject", "params": {
+            "user_id": USER_ID,
+            "grade": "grade_5",
+            "subject": "math"
+        }},
+        {"title": "📊 Test 12: Get Dashboard Stats", "endpoint": "/api/progress/dashboard", "params": {
+            "user_id": USER_ID
+        }},
+        {"title": "📊 Test 13: Get Complete User Progress", "endpoint": "/api/progress/user", "params": {
+            "user_id": USER_ID
+        }},
+        {"title": "📊 Test 14: Check Prerequisites", "endpoint": "/api/progress/check-prerequisites", "params": {
+            "user_id": USER_ID,
+            "prerequisites": "fractions_basic,geometry_intro"
+        }}
+    ])
     
+    result = results[2]  # Test 13
     if result and result.get("code") == 0:
         print("\n" + "="*60)
         print("📈 Progress Summary")
@@ -174,19 +168,12 @@ def main():
         print(f"Accuracy: {round(stats['total_questions_correct']/stats['total_questions_answered']*100, 1)}%")
         print(f"Time Spent: {stats['total_time_minutes']} minutes")
     
-    # Test 14: Check prerequisites
-    print("\n📊 Test 14: Check Prerequisites")
-    test_api("/api/progress/check-prerequisites", "GET", params={
-        "user_id": USER_ID,
-        "prerequisites": "fractions_basic,geometry_intro"
-    })
-    
     print("\n" + "="*60)
     print("✅ Progress Tracking Tests Complete!")
     print("="*60 + "\n")
     
     print("💡 Check the user_progress folder to see the saved data!")
-    print(f"   File: user_progress/{USER_ID.replace('/', '_')}.json")
+    print("   Database: user_progress/progress.db")
 
 if __name__ == "__main__":
     print("""
@@ -197,7 +184,7 @@ if __name__ == "__main__":
     """)
     
     try:
-        response = requests.get(f"{BASE_URL}/api/status", timeout=2)
+        response = SESSION.get(f"{BASE_URL}/api/status", timeout=2)
         if response.status_code == 200:
             print("✅ Server is running!\n")
             main()
@@ -0,0 +1,44 @@
+"""
+Test the answer evaluator's hint pre-filter (no model needed)
+"""
+from utils.answer_evaluator import AnswerEvaluator, SPELLING_HINT
+
+quick_hint = AnswerEvaluator._quick_hint
+
+
+def test_numeric_answers_reach_model():
+    """Wrong numbers and fractions are maths mistakes - never garbage, never spelling"""
+    for student, expected in [('7', '2/5'), ('3', '4/7'), ('11', '4/7'), ('12/5', '2/5'),
+                              ('3/12', '3/10'), ('5', '5/12'), ('42', '24'), ('2 / 5', '2/5')]:
+        assert quick_hint(student, expected) is None, (student, expected)
+
+
+def test_fraction_matching_expected():
+    """An exact answer is never told to check its spelling"""
+    assert quick_hint('2/5', '2/5') is None
+    assert quick_hint('Numerator', 'numerator') is None
+
+
+def test_word_answers():
+    """Typos of word answers get the spelling hint, mashing closes the quiz"""
+    assert quick_hint('denominater', 'denominator') == SPELLING_HINT
+    assert quick_hint('numerater', 'numerator') == SPELLING_HINT
+    assert quick_hint('x', 'denominator') == 'CLOSE_QUIZ'
+    assert quick_hint('zzz', 'numerator') == 'CLOSE_QUIZ'
+    assert quick_hint('?!', 'numerator') == 'CLOSE_QUIZ'
+    assert quick_hint('7', 'denominator') is None  # Numbers go to the model
+    assert quick_hint('the bottom number', 'denominator') is None
+
+
+if __name__ == "__main__":
+    print("\n" + "="*60)
+    print("Testing Quick Hint Pre-filter")
+    print("="*60)
+
+    for test in (test_numeric_answers_reach_model, test_fraction_matching_expected, test_word_answers):
+        test()
+        print(f"   ✅ {test.__name__}")
+
+    print("\n" + "="*60)
+    print("✅ All tests passed!")
+    print("="*60 + "\n")
@@ -3,13 +3,34 @@ Intel GPU Test Script for Xilo AI Tutor
 Tests PyTorch XPU functionality and Intel GPU detection
 """
 
+import os
 import sys
+import json
 import torch
 import logging
+from pathlib import Path
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Records that the XPU tensor test passed for a given torch/IPEX/device combination
+GPU_MARKER_FILE = Path.home() / ".cache" / "xilo" / "xpu_ok.json"
+
+def read_gpu_marker():
+    """Return the fingerprint of the last passing XPU tensor test (None if missing)"""
+    try:
+        return json.loads(GPU_MARKER_FILE.read_text(encoding='utf-8')).get("fingerprint")
+    except (OSError, ValueError):
+        return None
+
+def write_gpu_marker(fingerprint, device_name):
+    """Remember that the XPU tensor test passed for this fingerprint"""
+    try:
+        GPU_MARKER_FILE.parent.mkdir(parents=True, exist_ok=True)
+        GPU_MARKER_FILE.write_text(json.dumps({"fingerprint": fingerprint, "device_name": device_name}), encoding='utf-8')
+    except OSError as e:
+        print(f"⚠️  Could not save GPU test marker: {e}")
+
 def test_intel_gpu():
     """Test Intel GPU availability and functionality"""
     print("🔍 Testing Intel GPU Setup for Xilo AI Tutor")
@@ -39,17 +60,23 @@ def test_intel_gpu():
                     print(f"🎯 Current device: {current_device}")
                     print(f"💻 GPU Name: {device_name}")
                     
+                    # Skip the tensor test if it already passed on this exact torch/IPEX/GPU stack
+                    fingerprint = f"{torch.__version__}|{ipex.__version__}|{device_name}"
+                    if os.environ.get("XILO_FORCE_GPU_TEST") != "1" and read_gpu_marker() == fingerprint:
+                        print("\n✅ Tensor operations verified on a previous run (set XILO_FORCE_GPU_TEST=1 to re-test)")
+                        return True
+                    
                     # Test tensor operations
                     print("\n🧪 Testing tensor operations...")
                     device = torch.device(f"xpu:{current_device}")
                     
-                    # Create test tensors
-                    x = torch.randn(1000, 1000, device=device)
-                    y = torch.randn(1000, 1000, device=device)
+                    # Create test tensors - bf16 runs on the XMX engines (FP32 would not)
+                    x = torch.randn(1000, 1000, device=device, dtype=torch.bfloat16)
+                    y = torch.randn(1000, 1000, device=device, dtype=torch.bfloat16)
                     
                     # Perform matrix multiplication
                     result = torch.mm(x, y)
-                    print(f"✅ Matrix multiplication successful: {result.shape}")
+                    print(f"✅ Matrix multiplication successful: {result.shape} ({result.dtype})")
                     
                     # Test memory info
                     memory_allocated = torch.xpu.memory_allocated(current_device)
@@ -63,6 +90,8 @@ def test_intel_gpu():
                     torch.xpu.empty_cache()
                     print("🧹 Memory cleared")
                     
+                    write_gpu_marker(fingerprint, device_name)
+                    
                     print("\n🎉 Intel GPU test completed successfully!")
                     print("🚀 Your Battlemage GPU with XMX engines is ready for Xilo AI Tutor!")
                     
@@ -98,7 +127,12 @@ def test_model_compatibility():
         
         # Test tokenizer loading (lightweight)
         print("📝 Testing tokenizer loading...")
-        tokenizer = AutoTokenizer.from_pretrained("microsoft/DialoGPT-medium")
+        try:
+            # Cached copy first - skips the hub revision checks on repeat runs
+            tokenizer = AutoTokenizer.from_pretrained("microsoft/DialoGPT-medium", use_fast=True, local_files_only=True)
+        except OSError:
+            # First run - nothing cached yet, download it
+            tokenizer = AutoTokenizer.from_pretrained("microsoft/DialoGPT-medium", use_fast=True)
         print("✅ Tokenizer loaded successfully")
         
         print("🎯 Model compatibility test passed!")
@@ -5,28 +5,74 @@ Designed to be modular for future multi-user support
 """
 
 import logging
-from collections import deque
+import threading
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
+from typing import NamedTuple
 
 logger = logging.getLogger(__name__)
 
+# Bound on remembered sessions and how long an idle one is kept
+MAX_SESSIONS = 10000
+SESSION_TTL_SECONDS = 3600
+
+
+class MessagePair(NamedTuple):
+    """One remembered Q&A turn - tuple-sized, with named fields"""
+    user: str
+    assistant: str
+    ts: float  # time.time() when the turn was added
+
 class ChatMemory:
     """
     Manages chat history for individual users/sessions.
     Stores last N messages for context-aware conversations.
     """
     
-    def __init__(self, max_history=3):
+    def __init__(self, max_history=3, max_sessions=MAX_SESSIONS, session_ttl=SESSION_TTL_SECONDS):
         """
         Initialize chat memory.
         
         Args:
             max_history (int): Maximum number of Q&A pairs to remember (default: 3)
+            max_sessions (int): Maximum number of sessions kept; least recently used are dropped
+            session_ttl (float): Seconds of inactivity after which a session is dropped
         """
         self.max_history = max_history
-        self.sessions = {}  # session_id -> deque of messages
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.sessions = OrderedDict()  # session_id -> deque of messages, least recently used first
+        self._last_active = {}  # session_id -> time.time() of last use
+        self._lock = threading.Lock()
         logger.info(f"ChatMemory initialized with max_history={max_history}")
     
+    def _touch(self, session_id, now):
+        """Mark a session as most recently used (caller holds the lock)"""
+        self.sessions.move_to_end(session_id)
+        self._last_active[session_id] = now
+    
+    def _evict(self, now):
+        """Drop expired and over-capacity sessions, oldest first (caller holds the lock)"""
+        while self.sessions:
+            oldest = next(iter(self.sessions))
+            if len(self.sessions) <= self.max_sessions and now - self._last_active[oldest] < self.session_ttl:
+                break
+            del self.sessions[oldest]
+            del self._last_active[oldest]
+    
+    def _get_live(self, session_id, now):
+        """Get a session's deque, or None if missing or expired (caller holds the lock)"""
+        history = self.sessions.get(session_id)
+        if history is None:
+            return None
+        if now - self._last_active[session_id] >= self.session_ttl:
+            del self.sessions[session_id]
+            del self._last_active[session_id]
+            return None
+        self._touch(session_id, now)
+        return history
+    
     def add_message(self, session_id, user_message, ai_response):
         """
         Add a message pair to session history.
@@ -36,17 +82,20 @@ class ChatMemory:
             user_message (str): User's question
             ai_response (str): AI's response
         """
-        if session_id not in self.sessions:
-            self.sessions[session_id] = deque(maxlen=self.max_history)
-        
-        message_pair = {
-            'user': user_message,
-            'assistant': ai_response,
-            'timestamp': datetime.now().isoformat()
-        }
+        now = time.time()
+        # A tuple is a fraction of a dict's size; the timestamp is only
+        # formatted when history is read
+        message_pair = MessagePair(user_message, ai_response, now)
         
-        self.sessions[session_id].append(message_pair)
-        logger.info(f"Added message to session {session_id}. History size: {len(self.sessions[session_id])}")
+        with self._lock:
+            history = self._get_live(session_id, now)
+            if history is None:
+                history = self.sessions[session_id] = deque(maxlen=self.max_history)
+                self._last_active[session_id] = now
+                self._evict(now)
+            history.append(message_pair)
+            size = len(history)
+        logger.info(f"Added message to session {session_id}. History size: {size}")
     
     def get_history(self, session_id):
         """
@@ -58,10 +107,16 @@ class ChatMemory:
         Returns:
             list: List of message pairs (oldest to newest)
         """
-        if session_id not in self.sessions:
-            return []
+        with self._lock:
+            history = self._get_live(session_id, time.time())
+            if history is None:
+                return []
+            pairs = list(history)
         
-        return list(self.sessions[session_id])
+        return [
+            {'user': pair.user, 'assistant': pair.assistant, 'timestamp': datetime.fromtimestamp(pair.ts).isoformat()}
+            for pair in pairs
+        ]
     
     def get_context_messages(self, session_id):
         """
@@ -73,12 +128,18 @@ class ChatMemory:
         Returns:
             list: List of message dicts for chat template
         """
-        history = self.get_history(session_id)
-        messages = []
-        
-        for pair in history:
-            messages.append({"role": "user", "content": pair['user']})
-            messages.append({"role": "assistant", "content": pair['assistant']})
+        with self._lock:
+            history = self._get_live(session_id, time.time())
+            if not history:
+                return []
+            
+            # Walk the deque directly into a preallocated list - no intermediate copy
+            messages = [None] * (2 * len(history))
+            i = 0
+            for pair in history:
+                messages[i] = {"role": "user", "content": pair.user}
+                messages[i + 1] = {"role": "assistant", "content": pair.assistant}
+                i += 2
         
         return messages
     
@@ -89,13 +150,17 @@ class ChatMemory:
         Args:
             session_id (str): Unique session identifier
         """
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+        with self._lock:
+            removed = self.sessions.pop(session_id, None) is not None
+            self._last_active.pop(session_id, None)
+        if removed:
             logger.info(f"Cleared session {session_id}")
     
     def clear_all(self):
         """Clear all session histories."""
-        self.sessions.clear()
+        with self._lock:
+            self.sessions.clear()
+            self._last_active.clear()
         logger.info("Cleared all chat sessions")
     
     def get_session_count(self):
@@ -104,7 +169,8 @@ class ChatMemory:
     
     def get_all_sessions(self):
         """Get list of all active session IDs."""
-        return list(self.sessions.keys())
+        with self._lock:
+            return list(self.sessions.keys())
 
 # Global memory manager instance
 chat_memory = ChatMemory(max_history=3)
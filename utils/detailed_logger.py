@@ -6,24 +6,255 @@ Provides detailed system state tracking and rollback information
 import os
 import json
 import time
+import atexit
+import glob
+import sys
 import datetime
 import logging
+import logging.handlers
 import traceback
 import psutil
+import queue
 import threading
+from collections import deque
 from functools import wraps
 from typing import Dict, List, Any, Optional
 
+from utils.intel_gpu import gpu_manager
+
+try:
+    import orjson  # Optional: several times faster JSON encode
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack  # Optional: compact binary snapshot files (JSON used if missing)
+except ImportError:
+    msgpack = None
+
+
+def _dump_json(path, obj):
+    """Write obj as indented JSON (orjson if installed; anything unknown becomes str)"""
+    if orjson is not None:
+        payload = orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS, default=str)
+    else:
+        payload = json.dumps(obj, indent=2, default=str).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(payload)
+
+
+_now = datetime.datetime.now
+_iso_cache = (0, "")  # (whole second, its ISO string) - swapped as one tuple, so thread-safe
+
+
+def _iso_now():
+    """Current local time as an ISO 8601 string, at 1-second resolution (formatted once per second)"""
+    global _iso_cache
+    second = int(time.time())
+    cached = _iso_cache
+    if cached[0] != second:
+        cached = _iso_cache = (second, datetime.datetime.fromtimestamp(second).isoformat())
+    return cached[1]
+
+
+def _json_line(obj):
+    """obj as one line of JSON Lines bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS, default=str) + b"\n"
+    return (json.dumps(obj, default=str) + "\n").encode('utf-8')
+
+
+# In-memory performance/model-state history kept for the rollback guide
+# (the full history is in the .jsonl files)
+MAX_LOG_HISTORY = 10000
+MAX_SNAPSHOT_HISTORY = 100
+MAX_ERROR_HISTORY = 1000
+
+# Shared "no details" value for log entries - never mutated
+_EMPTY: Dict = {}
+
+# Rotation of the shared session log file
+LOG_FILE_MAX_BYTES = 64 << 20
+LOG_FILE_BACKUPS = 5
+
+
+# Rollback guide templates, filled with str.format (literal braces doubled)
+_GUIDE_HEADER = """
+# Xilo AI Tutor - Rollback Guide
+Generated: {generated}
+Session ID: {session_id}
+
+## System Snapshots
+"""
+_GUIDE_SNAPSHOT = """
+### Snapshot {number}: {name}
+- Timestamp: {timestamp}
+- CPU Usage: {cpu_percent}%
+- Memory Usage: {memory_percent}%
+- XPU Available: {xpu_available}
+"""
+_GUIDE_ERRORS_HEADER = """
+
+## Error History ({count} errors)
+"""
+_GUIDE_ERROR = """
+### Error {number}: {error_type}
+- Time: {timestamp}
+- Message: {message}
+- Context: {context}
+"""
+_GUIDE_PERFORMANCE_HEADER = """
+
+## Performance Issues
+"""
+_GUIDE_SLOW_OPERATION = """
+- {operation}: {duration:.2f}s at {timestamp}
+"""
+_GUIDE_MODEL_HEADER = """
+
+## Model State Changes
+"""
+_GUIDE_MODEL_STATE = """
+- {timestamp}: {state}
+"""
+_GUIDE_FOOTER = """
+
+## Rollback Steps
+
+### 1. Stop Current Session
+```bash
+# Stop the Flask server (Ctrl+C in terminal)
+# Or kill the process if unresponsive
+```
+
+### 2. Check System State
+```bash
+# Check GPU status
+python test_setup.py
+
+# Check disk space
+dir "models_cache"
+
+# Check memory usage
+```
+
+### 3. Clean Restart Options
+
+#### Option A: Quick Restart
+```bash
+# Just restart the application
+python app.py
+```
+
+#### Option B: Clear Model Cache
+```bash
+# Remove model cache if corrupted
+rmdir /s "models_cache"
+python app.py
+```
+
+#### Option C: Full Reset
+```bash
+# Reset virtual environment
+deactivate
+rmdir /s ".venv"
+python -m venv .venv
+.venv\\Scripts\\activate
+pip install -r requirements.txt
+python app.py
+```
+
+### 4. Recovery Commands
+```bash
+# Check Intel GPU drivers
+dxdiag
+
+# Update PyTorch XPU
+pip install --upgrade torch torchvision torchaudio --index-url https://download.pytorch.org/whl/xpu
+pip install --upgrade intel-extension-for-pytorch --extra-index-url https://pytorch-extension.intel.com/release-whl/stable/xpu/us/
+
+# Check system resources
+python -c "import psutil; print(f'CPU: {{psutil.cpu_percent()}}%, Memory: {{psutil.virtual_memory().percent}}%')"
+```
+
+## Log Files Locations
+- Main log (all categories): {log_dir}/xilo_{session_id}.log
+- System snapshots: {log_dir}/system/
+- Error details: {log_dir}/errors/
+- Performance data: {log_dir}/performance/
+- Model states: {log_dir}/model/
+
+## Contact Information
+If issues persist:
+1. Check the error logs in {log_dir}/errors/
+2. Review system snapshots for resource issues
+3. Verify Intel GPU driver installation
+4. Check model download integrity
+"""
+
+
 class XiloLogger:
+    _torch = None  # torch module, resolved on first use (never at import time)
+    
+    @classmethod
+    def _get_torch(cls):
+        """Import torch once and cache the module on the class"""
+        if cls._torch is None:
+            import torch
+            cls._torch = torch
+        return cls._torch
+    
+    def _xpu_info(self, torch):
+        """
+        (available, device index, device name) - from the shared gpu_manager
+        once it's set up, otherwise probed from torch.
+        """
+        if gpu_manager._initialized:
+            return gpu_manager.is_available, gpu_manager.current_device, gpu_manager.device_name
+        if hasattr(torch, 'xpu') and torch.xpu.is_available():
+            current_device = torch.xpu.current_device()
+            return True, current_device, torch.xpu.get_device_name(current_device)
+        return False, None, None
+    
     def __init__(self, log_dir="logs"):
         self.log_dir = log_dir
         self.session_id = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         self.setup_directories()
         self.setup_logging()
-        self.system_snapshots = []
-        self.error_history = []
-        self.performance_logs = []
-        self.model_state_log = []
+        self.system_snapshots = deque(maxlen=MAX_SNAPSHOT_HISTORY)
+        self._snapshot_count = 0  # Snapshots taken this session (the deque only keeps the latest)
+        self.error_history = deque(maxlen=MAX_ERROR_HISTORY)
+        self._error_count = 0
+        self._log_version = 0  # Bumped on every logged entry; keys the cached rollback guide
+        self._guide_cache = (None, None)  # (log version, guide text)
+        self.performance_logs = deque(maxlen=MAX_LOG_HISTORY)
+        self.model_state_log = deque(maxlen=MAX_LOG_HISTORY)
+        
+        # Reused for every snapshot; the first cpu_percent() calls set the
+        # baseline so later non-blocking readings are meaningful
+        self._proc = psutil.Process()
+        self._proc.cpu_percent(None)
+        psutil.cpu_percent(None)
+        self._disk_path = 'C:' if os.name == 'nt' else '/'
+        
+        # Snapshot fields that never change during a session
+        self._static_sys = {
+            'python_version': f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}",
+            'os_name': os.name,
+            'cpu_count': psutil.cpu_count(),
+            'boot_time': psutil.boot_time(),
+        }
+        
+        # Append-only JSON Lines - each entry is written once instead of
+        # re-serializing the whole history
+        self._perf_fp = open(f"{self.log_dir}/performance/performance_{self.session_id}.jsonl", 'ab', buffering=1 << 16)
+        self._model_fp = open(f"{self.log_dir}/model/model_states_{self.session_id}.jsonl", 'ab')
+        
+        # Snapshot/error/guide files are serialized and written on a background
+        # thread so monitored operations don't wait on disk
+        self._write_q = queue.Queue()
+        threading.Thread(target=self._writer_loop, name="xilo-log-writer", daemon=True).start()
+        atexit.register(self.close)
         
     def setup_directories(self):
         """Create logging directory structure"""
@@ -35,91 +266,65 @@ class XiloLogger:
         
     def setup_logging(self):
         """Setup detailed logging configuration"""
-        # Create formatters (without emojis for Windows compatibility)
+        # Create formatter (without emojis for Windows compatibility); %(name)s
+        # tells the categories apart in the shared file
         detailed_formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
         )
         
-        simple_formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s'
-        )
-        
-        # Main application log
-        self.main_logger = logging.getLogger('xilo_main')
+        # Main application log - the category loggers below are its children
+        # and propagate their records to it
+        self.main_logger = logging.getLogger('xilo')
         self.main_logger.setLevel(logging.DEBUG)
+        self.system_logger = logging.getLogger('xilo.system')
+        self.error_logger = logging.getLogger('xilo.errors')
+        self.perf_logger = logging.getLogger('xilo.performance')
+        self.model_logger = logging.getLogger('xilo.model')
         
-        # File handlers
-        main_handler = logging.FileHandler(
-            f"{self.log_dir}/xilo_main_{self.session_id}.log",
-            encoding='utf-8'
-        )
-        main_handler.setFormatter(detailed_formatter)
-        self.main_logger.addHandler(main_handler)
-        
-        # System log
-        self.system_logger = logging.getLogger('xilo_system')
-        system_handler = logging.FileHandler(
-            f"{self.log_dir}/system/system_{self.session_id}.log",
-            encoding='utf-8'
-        )
-        system_handler.setFormatter(detailed_formatter)
-        self.system_logger.addHandler(system_handler)
-        
-        # Error log
-        self.error_logger = logging.getLogger('xilo_errors')
-        error_handler = logging.FileHandler(
-            f"{self.log_dir}/errors/errors_{self.session_id}.log",
-            encoding='utf-8'
-        )
-        error_handler.setFormatter(detailed_formatter)
-        self.error_logger.addHandler(error_handler)
-        
-        # Performance log
-        self.perf_logger = logging.getLogger('xilo_performance')
-        perf_handler = logging.FileHandler(
-            f"{self.log_dir}/performance/perf_{self.session_id}.log",
+        # One rotating file for every category - one buffer and fd, bounded size
+        file_handler = logging.handlers.RotatingFileHandler(
+            f"{self.log_dir}/xilo_{self.session_id}.log",
+            maxBytes=LOG_FILE_MAX_BYTES,
+            backupCount=LOG_FILE_BACKUPS,
             encoding='utf-8'
         )
-        perf_handler.setFormatter(simple_formatter)
-        self.perf_logger.addHandler(perf_handler)
+        file_handler.setFormatter(detailed_formatter)
         
-        # Model state log
-        self.model_logger = logging.getLogger('xilo_model')
-        model_handler = logging.FileHandler(
-            f"{self.log_dir}/model/model_{self.session_id}.log",
-            encoding='utf-8'
-        )
-        model_handler.setFormatter(detailed_formatter)
-        self.model_logger.addHandler(model_handler)
+        # Loggers only enqueue records; the listener thread formats and writes them
+        self._log_q = queue.Queue(-1)
+        self.main_logger.addHandler(logging.handlers.QueueHandler(self._log_q))
+        self._listener = logging.handlers.QueueListener(self._log_q, file_handler, respect_handler_level=True)
+        self._listener.start()
         
     def log_system_snapshot(self, checkpoint_name: str = None):
         """Take a detailed system snapshot"""
         try:
-            import torch
+            torch = self._get_torch()
+            xpu_available, current_device, device_name = self._xpu_info(torch)
             
             snapshot = {
-                'timestamp': datetime.datetime.now().isoformat(),
-                'checkpoint_name': checkpoint_name or f"snapshot_{len(self.system_snapshots)}",
+                'timestamp': _iso_now(),
+                'checkpoint_name': checkpoint_name or f"snapshot_{self._snapshot_count}",
                 'system': {
+                    **self._static_sys,
                     'cpu_percent': psutil.cpu_percent(),
-                    'memory': dict(psutil.virtual_memory()._asdict()),
-                    'disk': dict(psutil.disk_usage('/')._asdict()) if os.name != 'nt' else dict(psutil.disk_usage('C:')._asdict()),
-                    'python_version': f"{psutil.sys.version_info.major}.{psutil.sys.version_info.minor}.{psutil.sys.version_info.micro}",
+                    'memory_percent': psutil.virtual_memory().percent,
+                    'disk_percent': psutil.disk_usage(self._disk_path).percent,
                 },
                 'pytorch': {
                     'version': torch.__version__,
                     'cuda_available': torch.cuda.is_available() if hasattr(torch, 'cuda') else False,
-                    'xpu_available': torch.xpu.is_available() if hasattr(torch, 'xpu') else False,
+                    'xpu_available': xpu_available,
                 }
             }
             
             # Add Intel GPU specific info
-            if hasattr(torch, 'xpu') and torch.xpu.is_available():
+            if xpu_available:
                 try:
                     snapshot['intel_gpu'] = {
                         'device_count': torch.xpu.device_count(),
-                        'current_device': torch.xpu.current_device(),
-                        'device_name': torch.xpu.get_device_name(torch.xpu.current_device()),
+                        'current_device': current_device,
+                        'device_name': device_name,
                         'memory_allocated': torch.xpu.memory_allocated(),
                         'memory_reserved': torch.xpu.memory_reserved(),
                     }
@@ -127,7 +332,7 @@ class XiloLogger:
                     snapshot['intel_gpu_error'] = str(e)
                     
             # Add process info
-            process = psutil.Process()
+            process = self._proc
             snapshot['process'] = {
                 'pid': process.pid,
                 'cpu_percent': process.cpu_percent(),
@@ -137,40 +342,48 @@ class XiloLogger:
             }
             
             self.system_snapshots.append(snapshot)
+            self._snapshot_count += 1
+            self._log_version += 1
             
             # Save to file
-            snapshot_file = f"{self.log_dir}/system/snapshot_{self.session_id}_{len(self.system_snapshots)}.json"
-            with open(snapshot_file, 'w', encoding='utf-8') as f:
-                json.dump(snapshot, f, indent=2, default=str)
+            snapshot_ext = 'msgpack' if msgpack is not None else 'json'
+            snapshot_file = f"{self.log_dir}/system/snapshot_{self.session_id}_{self._snapshot_count}.{snapshot_ext}"
+            self._write_q.put((snapshot_file, snapshot))
                 
-            self.system_logger.info(f"System snapshot saved: {checkpoint_name}")
+            self.system_logger.info("System snapshot saved: %s", checkpoint_name)
             return snapshot
             
         except Exception as e:
-            self.error_logger.error(f"Failed to create system snapshot: {e}")
+            self.error_logger.error("Failed to create system snapshot: %s", e)
             return None
     
-    def log_error(self, error: Exception, context: str = None, rollback_info: Dict = None):
-        """Log detailed error information"""
+    def log_error(self, error: Exception, context: str = None, rollback_info: Dict = None, include_state: bool = False):
+        """Log detailed error information (system state only with include_state=True)"""
         try:
+            # Format the error's own traceback - none for errors that were never raised
+            tb = None
+            if error.__traceback__ is not None:
+                tb = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+            
             error_entry = {
-                'timestamp': datetime.datetime.now().isoformat(),
+                'timestamp': _iso_now(),
                 'error_type': type(error).__name__,
                 'error_message': str(error),
                 'context': context,
-                'traceback': traceback.format_exc(),
+                'traceback': tb,
                 'rollback_info': rollback_info,
-                'system_state': self.get_current_system_state()
+                'system_state': self.get_current_system_state() if include_state else None
             }
             
             self.error_history.append(error_entry)
+            self._error_count += 1
+            self._log_version += 1
             
             # Save to file
-            error_file = f"{self.log_dir}/errors/error_{self.session_id}_{len(self.error_history)}.json"
-            with open(error_file, 'w', encoding='utf-8') as f:
-                json.dump(error_entry, f, indent=2, default=str)
+            error_file = f"{self.log_dir}/errors/error_{self.session_id}_{self._error_count}.json"
+            self._write_q.put((error_file, error_entry))
                 
-            self.error_logger.error(f"Error logged: {type(error).__name__} - {error}")
+            self.error_logger.error("Error logged: %s - %s", type(error).__name__, error)
             
             return error_entry
             
@@ -181,20 +394,18 @@ class XiloLogger:
         """Log performance metrics"""
         try:
             perf_entry = {
-                'timestamp': datetime.datetime.now().isoformat(),
+                'timestamp': _iso_now(),
                 'operation': operation,
                 'duration_seconds': duration,
-                'details': details or {}
+                'details': details if details is not None else _EMPTY
             }
             
             self.performance_logs.append(perf_entry)
-            self.perf_logger.info(f"{operation}: {duration:.3f}s")
+            self._log_version += 1
+            self.perf_logger.info("%s: %.3fs", operation, duration)
             
-            # Save detailed performance data
-            if len(self.performance_logs) % 10 == 0:  # Save every 10 entries
-                perf_file = f"{self.log_dir}/performance/performance_{self.session_id}.json"
-                with open(perf_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.performance_logs, f, indent=2, default=str)
+            # Save detailed performance data (buffered, flushed on close)
+            self._perf_fp.write(_json_line(perf_entry))
                     
         except Exception as e:
             print(f"Failed to log performance: {e}")
@@ -203,18 +414,18 @@ class XiloLogger:
         """Log model loading and state changes"""
         try:
             model_entry = {
-                'timestamp': datetime.datetime.now().isoformat(),
+                'timestamp': _iso_now(),
                 'state': state,
-                'details': details or {}
+                'details': details if details is not None else _EMPTY
             }
             
             self.model_state_log.append(model_entry)
-            self.model_logger.info(f"Model state: {state}")
+            self._log_version += 1
+            self.model_logger.info("Model state: %s", state)
             
-            # Save model state
-            model_file = f"{self.log_dir}/model/model_states_{self.session_id}.json"
-            with open(model_file, 'w', encoding='utf-8') as f:
-                json.dump(self.model_state_log, f, indent=2, default=str)
+            # Save model state - rare and useful after a crash, so flushed right away
+            self._model_fp.write(_json_line(model_entry))
+            self._model_fp.flush()
                 
         except Exception as e:
             print(f"Failed to log model state: {e}")
@@ -222,17 +433,18 @@ class XiloLogger:
     def get_current_system_state(self):
         """Get current system state for rollback purposes"""
         try:
-            import torch
+            torch = self._get_torch()
+            xpu_available = self._xpu_info(torch)[0]
             
             state = {
-                'timestamp': datetime.datetime.now().isoformat(),
+                'timestamp': _iso_now(),
                 'cpu_percent': psutil.cpu_percent(),
                 'memory_percent': psutil.virtual_memory().percent,
                 'pytorch_version': torch.__version__,
-                'xpu_available': torch.xpu.is_available() if hasattr(torch, 'xpu') else False,
+                'xpu_available': xpu_available,
             }
             
-            if hasattr(torch, 'xpu') and torch.xpu.is_available():
+            if xpu_available:
                 try:
                     state['xpu_memory_allocated'] = torch.xpu.memory_allocated()
                     state['xpu_memory_reserved'] = torch.xpu.memory_reserved()
@@ -242,148 +454,130 @@ class XiloLogger:
             return state
             
         except Exception as e:
-            return {'error': str(e), 'timestamp': datetime.datetime.now().isoformat()}
+            return {'error': str(e), 'timestamp': _iso_now()}
     
     def generate_rollback_guide(self) -> str:
-        """Generate a rollback guide based on logged information"""
+        """Generate a rollback guide based on logged information (cached until something new is logged)"""
+        version, guide = self._guide_cache
+        if version == self._log_version:
+            return guide
+        
         try:
-            guide = f"""
-# Xilo AI Tutor - Rollback Guide
-Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-Session ID: {self.session_id}
-
-## System Snapshots
-"""
-            for i, snapshot in enumerate(self.system_snapshots):
-                guide += f"""
-### Snapshot {i+1}: {snapshot.get('checkpoint_name', 'Unknown')}
-- Timestamp: {snapshot['timestamp']}
-- CPU Usage: {snapshot['system']['cpu_percent']}%
-- Memory Usage: {snapshot['system']['memory']['percent']}%
-- XPU Available: {snapshot['pytorch'].get('xpu_available', 'Unknown')}
-"""
-
-            guide += f"""
-
-## Error History ({len(self.error_history)} errors)
-"""
-            for i, error in enumerate(self.error_history[-5:]):  # Last 5 errors
-                guide += f"""
-### Error {i+1}: {error['error_type']}
-- Time: {error['timestamp']}
-- Message: {error['error_message']}
-- Context: {error.get('context', 'N/A')}
-"""
-
-            guide += f"""
-
-## Performance Issues
-"""
+            version = self._log_version
+            parts = [_GUIDE_HEADER.format(
+                generated=_now().strftime('%Y-%m-%d %H:%M:%S'),
+                session_id=self.session_id
+            )]
+            
+            first_number = self._snapshot_count - len(self.system_snapshots) + 1
+            for i, snapshot in enumerate(self.system_snapshots, first_number):
+                parts.append(_GUIDE_SNAPSHOT.format(
+                    number=i,
+                    name=snapshot.get('checkpoint_name', 'Unknown'),
+                    timestamp=snapshot['timestamp'],
+                    cpu_percent=snapshot['system']['cpu_percent'],
+                    memory_percent=snapshot['system']['memory_percent'],
+                    xpu_available=snapshot['pytorch'].get('xpu_available', 'Unknown')
+                ))
+            
+            parts.append(_GUIDE_ERRORS_HEADER.format(count=self._error_count))
+            for i, error in enumerate(list(self.error_history)[-5:]):  # Last 5 errors
+                parts.append(_GUIDE_ERROR.format(
+                    number=i + 1,
+                    error_type=error['error_type'],
+                    timestamp=error['timestamp'],
+                    message=error['error_message'],
+                    context=error.get('context', 'N/A')
+                ))
+            
+            parts.append(_GUIDE_PERFORMANCE_HEADER)
             slow_operations = [p for p in self.performance_logs if p['duration_seconds'] > 10]
             for op in slow_operations[-5:]:  # Last 5 slow operations
-                guide += f"""
-- {op['operation']}: {op['duration_seconds']:.2f}s at {op['timestamp']}
-"""
-
-            guide += f"""
-
-## Model State Changes
-"""
-            for state in self.model_state_log[-10:]:  # Last 10 state changes
-                guide += f"""
-- {state['timestamp']}: {state['state']}
-"""
-
-            guide += f"""
-
-## Rollback Steps
-
-### 1. Stop Current Session
-```bash
-# Stop the Flask server (Ctrl+C in terminal)
-# Or kill the process if unresponsive
-```
-
-### 2. Check System State
-```bash
-# Check GPU status
-python test_setup.py
-
-# Check disk space
-dir "models_cache"
-
-# Check memory usage
-```
-
-### 3. Clean Restart Options
-
-#### Option A: Quick Restart
-```bash
-# Just restart the application
-python app.py
-```
-
-#### Option B: Clear Model Cache
-```bash
-# Remove model cache if corrupted
-rmdir /s "models_cache"
-python app.py
-```
-
-#### Option C: Full Reset
-```bash
-# Reset virtual environment
-deactivate
-rmdir /s ".venv"
-python -m venv .venv
-.venv\\Scripts\\activate
-pip install -r requirements.txt
-python app.py
-```
-
-### 4. Recovery Commands
-```bash
-# Check Intel GPU drivers
-dxdiag
-
-# Update PyTorch XPU
-pip install --upgrade torch torchvision torchaudio --index-url https://download.pytorch.org/whl/xpu
-pip install --upgrade intel-extension-for-pytorch --extra-index-url https://pytorch-extension.intel.com/release-whl/stable/xpu/us/
-
-# Check system resources
-python -c "import psutil; print(f'CPU: {{psutil.cpu_percent()}}%, Memory: {{psutil.virtual_memory().percent}}%')"
-```
-
-## Log Files Locations
-- Main logs: {self.log_dir}/
-- System snapshots: {self.log_dir}/system/
-- Error details: {self.log_dir}/errors/
-- Performance data: {self.log_dir}/performance/
-- Model states: {self.log_dir}/model/
-
-## Contact Information
-If issues persist:
-1. Check the error logs in {self.log_dir}/errors/
-2. Review system snapshots for resource issues
-3. Verify Intel GPU driver installation
-4. Check model download integrity
-"""
-
+                parts.append(_GUIDE_SLOW_OPERATION.format(
+                    operation=op['operation'],
+                    duration=op['duration_seconds'],
+                    timestamp=op['timestamp']
+                ))
+            
+            parts.append(_GUIDE_MODEL_HEADER)
+            for state in list(self.model_state_log)[-10:]:  # Last 10 state changes
+                parts.append(_GUIDE_MODEL_STATE.format(timestamp=state['timestamp'], state=state['state']))
+            
+            parts.append(_GUIDE_FOOTER.format(log_dir=self.log_dir, session_id=self.session_id))
+            guide = "".join(parts)
+            self._guide_cache = (version, guide)
             return guide
             
         except Exception as e:
             return f"Failed to generate rollback guide: {e}"
     
+    def _writer_loop(self):
+        """Write queued (path, str or serializable object) items - .msgpack paths as msgpack, others as JSON"""
+        while True:
+            path, content = self._write_q.get()
+            try:
+                if isinstance(content, str):
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(content)
+                elif path.endswith('.msgpack'):
+                    with open(path, 'wb') as f:
+                        f.write(msgpack.packb(content, use_bin_type=True, default=str))
+                else:
+                    _dump_json(path, content)
+            except Exception as e:
+                print(f"Failed to write log file {path}: {e}")
+            finally:
+                self._write_q.task_done()
+    
+    def dump_snapshots_json(self) -> Optional[str]:
+        """
+        Convert this session's msgpack snapshot files into one readable JSON file.
+        
+        Returns:
+            Path of the JSON file (None if there's nothing to convert)
+        """
+        if msgpack is None:
+            return None  # Snapshots are already written as JSON
+        self.flush()
+        
+        pattern = f"{self.log_dir}/system/snapshot_{self.session_id}_*.msgpack"
+        paths = sorted(glob.glob(pattern), key=lambda p: int(p.rsplit('_', 1)[1].split('.')[0]))
+        if not paths:
+            return None
+        
+        snapshots = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                snapshots.append(msgpack.unpackb(f.read(), raw=False))
+        
+        json_file = f"{self.log_dir}/system/snapshots_{self.session_id}.json"
+        _dump_json(json_file, snapshots)
+        return json_file
+    
+    def flush(self):
+        """Block until every queued log file has been written"""
+        self._write_q.join()
+    
+    def close(self):
+        """Write pending log files and records, then close the log files"""
+        self.flush()
+        if self._listener._thread is not None:
+            self._listener.stop()  # Drains the record queue first
+            for handler in self._listener.handlers:
+                handler.close()
+        for fp in (self._perf_fp, self._model_fp):
+            if not fp.closed:
+                fp.close()
+    
     def save_rollback_guide(self):
         """Save the rollback guide to a file"""
         try:
             guide = self.generate_rollback_guide()
             guide_file = f"{self.log_dir}/ROLLBACK_GUIDE_{self.session_id}.md"
             
-            with open(guide_file, 'w', encoding='utf-8') as f:
-                f.write(guide)
+            self._write_q.put((guide_file, guide))
                 
-            self.main_logger.info(f"Rollback guide saved: {guide_file}")
+            self.main_logger.info("Rollback guide saved: %s", guide_file)
             return guide_file
             
         except Exception as e:
@@ -391,23 +585,21 @@ If issues persist:
             return None
 
 # Performance monitoring decorator
-def monitor_performance(logger_instance, operation_name):
+def monitor_performance(logger_instance, operation_name, min_ns=1_000_000):
+    """Log each call's duration - successful calls only when they take at least min_ns (default 1 ms)"""
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_ns = time.perf_counter_ns()
             try:
                 result = func(*args, **kwargs)
-                duration = time.time() - start_time
-                logger_instance.log_performance(operation_name, duration, {
-                    'success': True,
-                    'args_count': len(args),
-                    'kwargs_count': len(kwargs)
-                })
+                duration_ns = time.perf_counter_ns() - start_ns
+                if duration_ns >= min_ns:
+                    logger_instance.log_performance(operation_name, duration_ns * 1e-9)
                 return result
             except Exception as e:
-                duration = time.time() - start_time
-                logger_instance.log_performance(operation_name, duration, {
+                duration_ns = time.perf_counter_ns() - start_ns
+                logger_instance.log_performance(operation_name, duration_ns * 1e-9, {
                     'success': False,
                     'error': str(e)
                 })
@@ -0,0 +1,109 @@
+"""
+Hint Store - Disk-backed second tier for the AI hint cache
+Keeps generated hints in SQLite so they survive app restarts; the evaluator's
+in-memory LRU stays the first tier.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Hints older than this are deleted when the store is opened
+HINT_DB_TTL_SECONDS = 30 * 24 * 3600
+
+_CREATE_SQL = """CREATE TABLE IF NOT EXISTS hint_cache (
+    model TEXT NOT NULL,
+    qid TEXT NOT NULL,
+    question TEXT NOT NULL,
+    norm_answer TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    hint TEXT NOT NULL,
+    ts REAL NOT NULL,
+    PRIMARY KEY (model, qid, question, norm_answer, level)
+)"""
+_SELECT_SQL = "SELECT hint FROM hint_cache WHERE model=? AND qid=? AND question=? AND norm_answer=? AND level=?"
+_UPSERT_SQL = "INSERT OR REPLACE INTO hint_cache VALUES (?, ?, ?, ?, ?, ?, ?)"
+_EXPIRE_SQL = "DELETE FROM hint_cache WHERE ts < ?"
+
+
+class HintStore:
+    """
+    SQLite hint cache. Lookups run on the caller's thread; writes are queued
+    to a background thread so hint requests never wait on disk I/O.
+    """
+
+    def __init__(self, db_path: str = None, ttl_seconds: float = HINT_DB_TTL_SECONDS):
+        if db_path is None:
+            base_dir = Path(__file__).parent.parent
+            db_path = base_dir / "hint_cache.db"
+
+        self.db_path = str(db_path)
+        self.ttl_seconds = ttl_seconds
+        self._conn = None  # Reader connection, opened on first use
+        self._lock = threading.Lock()
+        self._writes = queue.Queue()
+
+    @staticmethod
+    def _row_key(key: Tuple) -> Tuple:
+        """(model, question id, question, normalized answer, level) as column values"""
+        model, qid, question, norm_answer, level = key
+        return (model, '' if qid is None else str(qid), question, norm_answer, level)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection in WAL mode - readers don't block on the writer thread"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _open(self) -> sqlite3.Connection:
+        """Create the table and start the writer thread on first use (caller holds the lock)"""
+        if self._conn is None:
+            conn = self._connect()
+            conn.execute(_CREATE_SQL)
+            self._conn = conn
+            threading.Thread(target=self._writer, name="hint-store-writer", daemon=True).start()
+        return self._conn
+
+    def _writer(self):
+        """Drop expired hints, then persist queued hints"""
+        try:
+            conn = self._connect()
+            expired = conn.execute(_EXPIRE_SQL, (time.time() - self.ttl_seconds,)).rowcount
+            if expired:
+                logger.info(f"Expired {expired} cached hint(s)")
+        except sqlite3.Error as e:
+            logger.warning(f"Hint store writer could not open {self.db_path}: {e}")
+            return
+
+        while True:
+            row = self._writes.get()
+            try:
+                conn.execute(_UPSERT_SQL, row)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to persist hint: {e}")
+
+    def get(self, key: Tuple) -> Optional[str]:
+        """Return a stored hint (None on miss or if the store is unavailable)"""
+        try:
+            with self._lock:
+                row = self._open().execute(_SELECT_SQL, self._row_key(key)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Hint store lookup failed: {e}")
+            return None
+        return row[0] if row else None
+
+    def put(self, key: Tuple, hint: str) -> None:
+        """Queue a hint to be written in the background"""
+        try:
+            with self._lock:
+                self._open()
+        except sqlite3.Error as e:
+            logger.warning(f"Hint store unavailable: {e}")
+            return
+        self._writes.put(self._row_key(key) + (hint, time.time()))
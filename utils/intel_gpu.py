@@ -19,6 +19,9 @@ class IntelGPUManager:
     def __init__(self):
         self.device = None
         self.is_available = False
+        self.current_device = None  # XPU index and name, read once at setup
+        self.device_name = None
+        self._torch = None
         self._initialized = False
         # Do NOT call any torch.xpu methods here - they auto-import IPEX in PyTorch 2.6!
     
@@ -32,6 +35,7 @@ class IntelGPUManager:
         
         # Import torch HERE - after ipex-llm has already loaded it
         import torch
+        self._torch = torch
             
         try:
             # NOW it's safe to check XPU - ipex-llm has already imported IPEX
@@ -41,10 +45,10 @@ class IntelGPUManager:
                 
                 # Get GPU info
                 gpu_count = torch.xpu.device_count()
-                current_device = torch.xpu.current_device()
-                gpu_name = torch.xpu.get_device_name(current_device)
+                self.current_device = torch.xpu.current_device()
+                self.device_name = torch.xpu.get_device_name(self.current_device)
                 
-                logger.info(f"✅ Intel GPU initialized: {gpu_name}")
+                logger.info(f"✅ Intel GPU initialized: {self.device_name}")
                 logger.info(f"Available XPU devices: {gpu_count}")
                 logger.info(f"Using device: {self.device}")
                 
@@ -92,19 +96,17 @@ class IntelGPUManager:
         if not self.is_available:
             return {"device": "cpu", "type": "CPU", "available": False}
         
-        # Import torch locally
-        import torch
+        # torch module and device index/name were cached at setup
+        xpu = self._torch.xpu
         
         try:
-            current_device = torch.xpu.current_device()
-            gpu_name = torch.xpu.get_device_name(current_device)
-            memory_allocated = torch.xpu.memory_allocated(current_device)
-            memory_cached = torch.xpu.memory_reserved(current_device)
+            memory_allocated = xpu.memory_allocated(self.current_device)
+            memory_cached = xpu.memory_reserved(self.current_device)
             
             return {
                 "device": str(self.device),
                 "type": "Intel XPU",
-                "name": gpu_name,
+                "name": self.device_name,
                 "available": True,
                 "memory_allocated": f"{memory_allocated / 1024**3:.2f} GB",
                 "memory_cached": f"{memory_cached / 1024**3:.2f} GB"
@@ -117,10 +119,8 @@ class IntelGPUManager:
     def clear_memory(self):
         """Clear GPU memory cache (safe to call after initialization)"""
         if self._initialized and self.is_available:
-            # Import torch locally
-            import torch
             try:
-                torch.xpu.empty_cache()
+                self._torch.xpu.empty_cache()
                 logger.info("Intel XPU memory cache cleared")
             except Exception as e:
                 logger.error(f"Error clearing XPU memory: {e}")
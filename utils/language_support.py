@@ -3,11 +3,125 @@ Multilingual Support for Xilo AI Tutor
 Simple and direct language instructions
 """
 
+import functools
 import logging
-from typing import Dict, Optional
+import sys
+from types import MappingProxyType
+from typing import Dict, List, Optional
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Script codepoint ranges in detection priority order; script id = index + 1 (0 = none/'en')
+_SCRIPT_RANGES = (
+    ('zh', 0x4e00, 0x9fff),
+    ('ja', 0x3040, 0x30ff),  # Hiragana + Katakana
+    ('ko', 0xac00, 0xd7af),
+    ('ar', 0x0600, 0x06ff),
+    ('hi', 0x0900, 0x097f),
+    ('ru', 0x0400, 0x04ff),
+)
+_SCRIPT_LANGS = ('en',) + tuple(lang for lang, _, _ in _SCRIPT_RANGES)
+# (lo, hi, bit) for the short-text scan; lower bit = higher priority
+_SCRIPT_BITS = tuple((lo, hi, 1 << i) for i, (_, lo, hi) in enumerate(_SCRIPT_RANGES))
+
+_BLOCK_SHIFT = 7
+_BLOCK_MASK = (1 << _BLOCK_SHIFT) - 1
+
+
+def _build_script_tables():
+    """
+    Two-level codepoint -> script id table: codepoint >> 7 picks a block, the
+    low 7 bits index into that block's row. Identical blocks share one row.
+    """
+    bmp = np.zeros(0x10000, dtype=np.uint8)
+    for script_id, (_, lo, hi) in enumerate(_SCRIPT_RANGES, start=1):
+        bmp[lo:hi + 1] = script_id
+
+    # np.unique sorts rows, so the all-zero block is row 0 - the default for
+    # every block outside the BMP
+    cells, bmp_blocks = np.unique(bmp.reshape(-1, _BLOCK_MASK + 1), axis=0, return_inverse=True)
+    blocks = np.zeros(0x110000 >> _BLOCK_SHIFT, dtype=np.uint8)
+    blocks[:bmp_blocks.size] = bmp_blocks.ravel()
+    return blocks, cells
+
+
+_BLOCK_TABLE, _CELL_TABLE = _build_script_tables()
+
+# Mask of script ids seen (bit n = id n) -> highest-priority script id present
+_MASK_TO_SCRIPT = np.array(
+    [((m >> 1) & -(m >> 1)).bit_length() for m in range(1 << len(_SCRIPT_LANGS))],
+    dtype=np.uint8
+)
+
+# Below this length the UTF-32 encode costs more than the Python scan
+_VECTORIZE_MIN_LEN = 32
+# Texts up to this length go through the detection cache
+DETECT_CACHE_MAX_LEN = 128
+
+
+def _detect_script(text: str) -> str:
+    """Highest-priority script present in text ('en' if none)"""
+    if len(text) < _VECTORIZE_MIN_LEN:
+        # Single pass collecting one bit per script seen; stop early once
+        # the top-priority script is found
+        ranges = _SCRIPT_BITS
+        mask = 0
+        for c in text:
+            o = ord(c)
+            if o < 0x0400:
+                continue
+            for lo, hi, bit in ranges:
+                if lo <= o <= hi:
+                    mask |= bit
+                    break
+            if mask & 1:
+                break
+        return _SCRIPT_LANGS[(mask & -mask).bit_length()] if mask else 'en'
+
+    # One encode, then a single table lookup classifies every codepoint
+    arr = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    ids = _CELL_TABLE[_BLOCK_TABLE[arr >> _BLOCK_SHIFT], arr & _BLOCK_MASK]
+    present = np.flatnonzero(np.bincount(ids, minlength=len(_SCRIPT_LANGS))[1:])
+    return _SCRIPT_LANGS[present[0] + 1] if present.size else 'en'
+
+
+def _detect_scripts_batch(texts: List[str]) -> List[str]:
+    """
+    _detect_script over many texts at once: every text is encoded into one
+    codepoint buffer, classified with a single table lookup, and each text's
+    scripts are OR-reduced over its slice of the buffer.
+    """
+    langs = ['en'] * len(texts)
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    nonempty = np.flatnonzero(lengths)
+    if not nonempty.size:
+        return langs
+
+    arr = np.frombuffer(b''.join(t.encode('utf-32-le', 'surrogatepass') for t in texts), dtype=np.uint32)
+    ids = _CELL_TABLE[_BLOCK_TABLE[arr >> _BLOCK_SHIFT], arr & _BLOCK_MASK]
+    starts = (np.cumsum(lengths) - lengths)[nonempty]
+    masks = np.bitwise_or.reduceat(np.left_shift(np.uint8(1), ids), starts)
+    for i, script_id in zip(nonempty.tolist(), _MASK_TO_SCRIPT[masks].tolist()):
+        langs[i] = _SCRIPT_LANGS[script_id]
+    return langs
+
+
+@functools.lru_cache(maxsize=4096)
+def _detect_cached(text: str) -> str:
+    """Memoized _detect_script for short texts"""
+    return _detect_script(text)
+
+
+def _build_system_prompts(core_rules: str, instructions: Dict[str, str]) -> MappingProxyType:
+    """Read-only {language: core rules + language instruction} map with interned prompts"""
+    return MappingProxyType({
+        code: sys.intern(f"{core_rules}\n{instruction}")
+        for code, instruction in instructions.items()
+    })
+
+
 class LanguageManager:
     """Manages multilingual support for the AI tutor."""
     
@@ -64,22 +178,8 @@ class LanguageManager:
         'ml': "Answer in Malayalam only. Use proper Malayalam script. മലയാളത്തിൽ മാത്രം ഉത്തരം നൽകുക.",
     }
     
-    # Combined system prompts
-    SYSTEM_PROMPTS = {
-        'en': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['en']}",
-        'es': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['es']}",
-        'fr': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['fr']}",
-        'de': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['de']}",
-        'it': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['it']}",
-        'pt': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['pt']}",
-        'zh': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['zh']}",
-        'ja': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['ja']}",
-        'ko': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['ko']}",
-        'ar': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['ar']}",
-        'hi': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['hi']}",
-        'ru': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['ru']}",
-        'ml': f"{CORE_RULES}\n{LANGUAGE_INSTRUCTIONS['ml']}",
-    }
+    # Combined system prompts, one per language
+    SYSTEM_PROMPTS = _build_system_prompts(CORE_RULES, LANGUAGE_INSTRUCTIONS)
     
     def __init__(self):
         logger.info(f"LanguageManager initialized with {len(self.SUPPORTED_LANGUAGES)} languages")
@@ -98,19 +198,15 @@ class LanguageManager:
         return self.SYSTEM_PROMPTS['en']
     
     def detect_language(self, text: str) -> Optional[str]:
-        if any('\u4e00' <= c <= '\u9fff' for c in text):
-            return 'zh'
-        elif any('\u3040' <= c <= '\u309f' or '\u30a0' <= c <= '\u30ff' for c in text):
-            return 'ja'
-        elif any('\uac00' <= c <= '\ud7af' for c in text):
-            return 'ko'
-        elif any('\u0600' <= c <= '\u06ff' for c in text):
-            return 'ar'
-        elif any('\u0900' <= c <= '\u097f' for c in text):
-            return 'hi'
-        elif any('\u0400' <= c <= '\u04ff' for c in text):
-            return 'ru'
-        return 'en'
+        # Short texts (greetings, repeated prompts) are memoized; long pastes
+        # would only churn the cache
+        if len(text) <= DETECT_CACHE_MAX_LEN:
+            return _detect_cached(text)
+        return _detect_script(text)
+    
+    def detect_language_batch(self, texts: List[str]) -> List[str]:
+        """detect_language for many texts (logs, documents) in one vectorized pass"""
+        return _detect_scripts_batch(texts)
     
     def get_greeting(self, language_code: str) -> str:
         greetings = {
@@ -2,8 +2,29 @@
 Lesson Manager - Load and manage lessons from JSON files
 """
 import json
+import re
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import orjson  # Optional: several times faster JSON parsing
+except ImportError:
+    orjson = None
+
+
+def _load_json(path: Path):
+    """Parse a JSON file (orjson if installed)"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _trigrams(word: str) -> set:
+    """All 3-character substrings of word"""
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
 
 class LessonManager:
     """Manages loading and accessing lesson data"""
@@ -17,14 +38,74 @@ class LessonManager:
         self.lessons_dir = Path(lessons_dir)
         self.metadata_file = self.lessons_dir / "metadata.json"
         self.metadata = self._load_metadata()
+        self._lesson_index = self._build_lesson_index()  # (grade, subject, lesson id) -> lesson metadata
+        self._lesson_cache = {}  # lesson file -> (mtime_ns, parsed lesson, lookups)
+        self._search_index = None  # (entries, token -> entry indices, trigram -> tokens), built on first search
     
     def _load_metadata(self) -> Dict:
         """Load the metadata.json file"""
         if not self.metadata_file.exists():
             raise FileNotFoundError(f"Metadata file not found: {self.metadata_file}")
         
-        with open(self.metadata_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return _load_json(self.metadata_file)
+    
+    def _build_lesson_index(self) -> Dict:
+        """Map (grade, subject, lesson id) to the lesson's metadata entry"""
+        index = {}
+        for grade_id, grade_data in self.metadata['grades'].items():
+            for subject_id, subject_data in grade_data['subjects'].items():
+                for lesson_meta in subject_data['lessons']:
+                    index[(grade_id, subject_id, lesson_meta['id'])] = lesson_meta
+        return index
+    
+    @staticmethod
+    def _build_lookups(lesson: Dict) -> Dict:
+        """
+        Id lookups for one parsed lesson, kept next to it in the cache (not in the
+        lesson dict itself, which is returned to API clients as-is).
+        
+        Returns:
+            dict: 'sections' (section id -> section), 'questions'
+                ((section id, question id) -> question) and 'prerequisites' (frozenset)
+        """
+        # Built in reverse so the first of any duplicate ids wins, as with a linear scan
+        sections = lesson.get('sections', [])
+        return {
+            'sections': {section['id']: section for section in reversed(sections)},
+            'questions': {
+                (section['id'], question['id']): question
+                for section in reversed(sections)
+                for question in reversed(section.get('questions', []))
+            },
+            'prerequisites': frozenset(lesson.get('prerequisites', []))
+        }
+    
+    def _load_lesson_file(self, lesson_file: Path) -> Optional[Tuple[Dict, Dict]]:
+        """Parse a lesson file into (lesson, lookups), reusing the previous parse until the file changes"""
+        try:
+            mtime = lesson_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._lesson_cache.pop(lesson_file, None)
+            return None
+        
+        cached = self._lesson_cache.get(lesson_file)
+        if cached is not None and cached[0] == mtime:
+            return cached[1:]
+        
+        lesson = _load_json(lesson_file)
+        lookups = self._build_lookups(lesson)
+        self._lesson_cache[lesson_file] = (mtime, lesson, lookups)
+        return lesson, lookups
+    
+    def prime_cache(self) -> int:
+        """Parse every lesson listed in the metadata up front. Returns the number loaded."""
+        loaded = 0
+        for grade_data in self.metadata['grades'].values():
+            for subject_data in grade_data['subjects'].values():
+                for lesson_meta in subject_data['lessons']:
+                    if self._load_lesson_file(self.lessons_dir.parent / lesson_meta['file']) is not None:
+                        loaded += 1
+        return loaded
     
     def get_all_grades(self) -> List[Dict]:
         """Get list of all available grades"""
@@ -61,66 +142,39 @@ class LessonManager:
         
         return self.metadata['grades'][grade]['subjects'][subject]['lessons']
     
-    def get_lesson(self, grade: str, subject: str, lesson_id: str) -> Optional[Dict]:
-        """Load a specific lesson file"""
-        lessons = self.get_lessons(grade, subject)
-        
-        # Find lesson in metadata
-        lesson_meta = None
-        for lesson in lessons:
-            if lesson['id'] == lesson_id:
-                lesson_meta = lesson
-                break
-        
+    def _get_lesson_entry(self, grade: str, subject: str, lesson_id: str) -> Optional[Tuple[Dict, Dict]]:
+        """(lesson, lookups) for a lesson, or None if it isn't listed or its file is missing/empty"""
+        lesson_meta = self._lesson_index.get((grade, subject, lesson_id))
         if not lesson_meta:
             return None
         
-        # Load lesson file
-        lesson_file = self.lessons_dir.parent / lesson_meta['file']
-        
-        if not lesson_file.exists():
-            return None
-        
-        with open(lesson_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        entry = self._load_lesson_file(self.lessons_dir.parent / lesson_meta['file'])
+        return entry if entry and entry[0] else None
+    
+    def get_lesson(self, grade: str, subject: str, lesson_id: str) -> Optional[Dict]:
+        """Load a specific lesson file (cached - treat the returned dict as read-only)"""
+        entry = self._get_lesson_entry(grade, subject, lesson_id)
+        return entry[0] if entry else None
     
     def get_section(self, grade: str, subject: str, lesson_id: str, section_id: str) -> Optional[Dict]:
         """Get a specific section from a lesson"""
-        lesson = self.get_lesson(grade, subject, lesson_id)
-        
-        if not lesson:
-            return None
-        
-        for section in lesson.get('sections', []):
-            if section['id'] == section_id:
-                return section
-        
-        return None
+        entry = self._get_lesson_entry(grade, subject, lesson_id)
+        return entry[1]['sections'].get(section_id) if entry else None
     
     def get_question(self, grade: str, subject: str, lesson_id: str, section_id: str, question_id: str) -> Optional[Dict]:
         """Get a specific question from a section"""
-        section = self.get_section(grade, subject, lesson_id, section_id)
-        
-        if not section:
-            return None
-        
-        for question in section.get('questions', []):
-            if question['id'] == question_id:
-                return question
-        
-        return None
+        entry = self._get_lesson_entry(grade, subject, lesson_id)
+        return entry[1]['questions'].get((section_id, question_id)) if entry else None
     
     def check_prerequisites(self, grade: str, subject: str, lesson_id: str, completed_lessons: List[str]) -> bool:
         """Check if all prerequisites for a lesson are completed"""
-        lesson = self.get_lesson(grade, subject, lesson_id)
+        entry = self._get_lesson_entry(grade, subject, lesson_id)
         
-        if not lesson:
+        if not entry:
             return False
         
-        prerequisites = lesson.get('prerequisites', [])
-        
         # All prerequisites must be in completed_lessons
-        return all(prereq in completed_lessons for prereq in prerequisites)
+        return entry[1]['prerequisites'].issubset(completed_lessons)
     
     def get_next_lessons(self, grade: str, subject: str, lesson_id: str) -> List[Dict]:
         """Get recommended next lessons after completing this one"""
@@ -129,38 +183,82 @@ class LessonManager:
         if not lesson:
             return []
         
-        next_lesson_ids = lesson.get('next_lessons', [])
+        # Summary fields come from metadata.json - no need to open each next lesson's file
         next_lessons = []
-        
-        for next_id in next_lesson_ids:
-            next_lesson = self.get_lesson(grade, subject, next_id)
-            if next_lesson:
+        for next_id in lesson.get('next_lessons', []):
+            next_meta = self._lesson_index.get((grade, subject, next_id))
+            if next_meta:
                 next_lessons.append({
-                    'id': next_lesson['id'],
-                    'title': next_lesson['title'],
-                    'difficulty': next_lesson['difficulty'],
-                    'estimated_time_minutes': next_lesson['estimated_time_minutes']
+                    'id': next_meta['id'],
+                    'title': next_meta['title'],
+                    'difficulty': next_meta['difficulty'],
+                    'estimated_time_minutes': next_meta['estimated_time_minutes']
                 })
         
         return next_lessons
     
-    def search_lessons(self, query: str) -> List[Dict]:
-        """Search for lessons by title or keywords"""
-        results = []
-        query_lower = query.lower()
+    def _get_search_index(self):
+        """
+        Inverted index over lesson titles and ids, built once from the metadata.
         
-        for grade_id, grade_data in self.metadata['grades'].items():
-            for subject_id, subject_data in grade_data['subjects'].items():
-                for lesson in subject_data['lessons']:
-                    if query_lower in lesson['title'].lower() or query_lower in lesson['id'].lower():
-                        results.append({
+        Returns:
+            tuple: (entries, postings, trigrams) - entries is a list of
+                (title_lower, id_lower, search result), postings maps each
+                lowercase word to the set of entry indices containing it, and
+                trigrams maps each 3-character substring to the indexed words containing it
+        """
+        if self._search_index is None:
+            entries = []
+            postings = {}
+            for grade_id, grade_data in self.metadata['grades'].items():
+                for subject_id, subject_data in grade_data['subjects'].items():
+                    for lesson in subject_data['lessons']:
+                        title_lower = lesson['title'].lower()
+                        id_lower = lesson['id'].lower()
+                        for token in re.findall(r'\w+', f"{title_lower} {id_lower}"):
+                            postings.setdefault(token, set()).add(len(entries))
+                        entries.append((title_lower, id_lower, {
                             'grade': grade_id,
                             'grade_name': grade_data['name'],
                             'subject': subject_id,
                             'subject_name': subject_data['name'],
                             **lesson
-                        })
+                        }))
+            trigrams = {}
+            for word in postings:
+                for tri in _trigrams(word):
+                    trigrams.setdefault(tri, set()).add(word)
+            self._search_index = (entries, postings, trigrams)
+        return self._search_index
+    
+    def search_lessons(self, query: str) -> List[Dict]:
+        """Search for lessons by title or keywords (results are shared - treat them as read-only)"""
+        entries, postings, trigrams = self._get_search_index()
+        query_lower = query.lower()
+        
+        # Narrow to lessons containing every query word. Words at the edges of the
+        # query may be partial ("fraction" in "fractions"), so match any indexed word containing them
+        candidates = None
+        for token in set(re.findall(r'\w+', query_lower)):
+            if len(token) >= 3:
+                # Only words sharing all of the token's trigrams can contain it
+                words = set.intersection(*(trigrams.get(tri, set()) for tri in _trigrams(token)))
+            else:
+                words = postings.keys()
+            matched = set().union(*(postings[word] for word in words if token in word))
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return []
+        if candidates is None:  # No word characters in the query - check every lesson
+            candidates = range(len(entries))
         
+        # Confirm the full query as a substring of the title or id. Result dicts
+        # were built once with the index, so hits are returned without copying
+        results = []
+        for i in sorted(candidates):
+            title_lower, id_lower, result = entries[i]
+            if query_lower in title_lower or query_lower in id_lower:
+                results.append(result)
         return results
 
 
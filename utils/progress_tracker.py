@@ -1,40 +1,232 @@
 """
 Progress Tracker - Track student learning progress
-Stores progress in JSON files (can be upgraded to database later)
+Stores progress in SQLite (user_progress/progress.db); per-user JSON files
+from earlier versions are imported on first access
 """
+import atexit
 import json
 import os
+import re
+import sqlite3
+import sys
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import orjson  # Optional: several times faster JSON encode/decode
+except ImportError:
+    orjson = None
+
+# Changed progress is written to the database at most this many seconds after the first unsaved change
+PROGRESS_FLUSH_DELAY = 2.0
+
+# Characters not allowed in legacy progress file names (\w is Unicode-aware, like str.isalnum)
+_UNSAFE_ID_RE = re.compile(r'[^\w-]')
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS users (
+        user_id TEXT PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        last_active TEXT NOT NULL,
+        stats_json TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS lesson_progress (
+        user_id TEXT NOT NULL,
+        lesson_key TEXT NOT NULL,
+        data_json TEXT NOT NULL,
+        PRIMARY KEY (user_id, lesson_key)
+    )""",
+    """CREATE TABLE IF NOT EXISTS question_answers (
+        user_id TEXT NOT NULL,
+        lesson_key TEXT NOT NULL,
+        question_id TEXT NOT NULL,
+        data_json TEXT NOT NULL,
+        PRIMARY KEY (user_id, lesson_key, question_id)
+    )""",
+)
+
+# Row kinds -> (upsert, delete) statements. Upserts keep the rowid, so reads in
+# rowid order return lessons and questions in the order they were started/answered.
+_ROW_SQL = {
+    'user': (
+        "INSERT INTO users VALUES (?, ?, ?, ?) ON CONFLICT(user_id) DO UPDATE SET "
+        "created_at=excluded.created_at, last_active=excluded.last_active, stats_json=excluded.stats_json",
+        "DELETE FROM users WHERE user_id=?"
+    ),
+    'lesson': (
+        "INSERT INTO lesson_progress VALUES (?, ?, ?) ON CONFLICT(user_id, lesson_key) DO UPDATE SET "
+        "data_json=excluded.data_json",
+        "DELETE FROM lesson_progress WHERE user_id=? AND lesson_key=?"
+    ),
+    'question': (
+        "INSERT INTO question_answers VALUES (?, ?, ?, ?) ON CONFLICT(user_id, lesson_key, question_id) DO UPDATE SET "
+        "data_json=excluded.data_json",
+        "DELETE FROM question_answers WHERE user_id=? AND lesson_key=? AND question_id=?"
+    ),
+}
+_USER_ROW = ('user',)
+
+
+_iso_cache = (0, "")  # (whole second, its ISO string) - swapped as one tuple, so thread-safe
+
+
+def _iso_now() -> str:
+    """Current local time as an ISO 8601 string, at 1-second resolution (formatted once per second)"""
+    global _iso_cache
+    second = int(time.time())
+    cached = _iso_cache
+    if cached[0] != second:
+        cached = _iso_cache = (second, datetime.fromtimestamp(second).isoformat())
+    return cached[1]
+
+
+def _dumps(obj) -> str:
+    """Compact JSON text"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def _loads(data):
+    """Parse JSON text or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _split_progress(progress: Dict) -> Dict[Tuple, Tuple]:
+    """
+    Break a progress dict into database rows.
+    
+    Returns:
+        Ordered {row key: column values} - ('user',), ('lesson', lesson_key)
+        and ('question', lesson_key, question_id)
+    """
+    # Key strings are interned: every question row repeats its lesson key, and the
+    # same keys are held again for each save
+    intern = sys.intern
+    rows = {_USER_ROW: (progress["created_at"], progress["last_active"], _dumps(progress["stats"]))}
+    for lesson_key, lesson in progress["lessons"].items():
+        lesson_key = intern(lesson_key)
+        # Questions get their own rows; the empty placeholder keeps the lesson's key order
+        rows[('lesson', lesson_key)] = (_dumps({**lesson, "questions_answered": {}}),)
+        for question_id, question in lesson["questions_answered"].items():
+            rows[('question', lesson_key, intern(question_id))] = (_dumps(question),)
+    return rows
+
+
+def _join_progress(user_id: str, rows: Dict[Tuple, Tuple]) -> Dict:
+    """Rebuild a (private) progress dict from rows made by _split_progress or read from the database"""
+    created_at, last_active, stats_json = rows[_USER_ROW]
+    lessons = {}
+    for key, values in rows.items():
+        if key[0] == 'lesson':
+            lessons[key[1]] = _loads(values[0])
+        elif key[0] == 'question' and key[1] in lessons:
+            lessons[key[1]]["questions_answered"][key[2]] = _loads(values[0])
+    return {
+        "user_id": user_id,
+        "created_at": created_at,
+        "last_active": last_active,
+        "lessons": lessons,  # lesson_id -> lesson progress
+        "stats": _loads(stats_json)
+    }
+
 
 class ProgressTracker:
-    """Manages student progress tracking"""
+    """
+    Manages student progress tracking.
     
-    def __init__(self, progress_dir: str = None):
+    Saved progress is kept in memory as rows of serialized JSON (each load
+    parses a private copy) until a background flush writes only the
+    user/lesson/question rows that changed, so recording an answer updates a
+    few small rows instead of rewriting the user's whole history. Flushed users
+    are dropped from memory and re-read from the database on their next load.
+    """
+    
+    def __init__(self, progress_dir: str = None, flush_delay: float = PROGRESS_FLUSH_DELAY):
         if progress_dir is None:
             base_dir = Path(__file__).parent.parent
             progress_dir = base_dir / "user_progress"
         
         self.progress_dir = Path(progress_dir)
         self.progress_dir.mkdir(exist_ok=True)
+        self.flush_delay = flush_delay
+        
+        # WAL: readers never wait on the flush, and commits skip the per-write fsync
+        self._conn = sqlite3.connect(str(self.progress_dir / "progress.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+        
+        # Legacy per-user JSON files, listed once so lookups don't stat() each file
+        with os.scandir(self.progress_dir) as entries:
+            self._known_files = {entry.name for entry in entries if entry.name.endswith('.json')}
+        self._rows = {}  # user_id -> latest rows, held only until they're flushed
+        self._dirty = set()  # user_ids whose rows haven't been written
+        self._timers = {}  # user_id -> pending flush timer
+        self._lock = threading.Lock()  # Guards the caches and the shared connection
+        atexit.register(self.flush_all)
     
     def _get_user_file(self, user_id: str) -> Path:
-        """Get path to user's progress file"""
+        """Get path to user's legacy progress file"""
         # Sanitize user_id for filename
-        safe_user_id = "".join(c if c.isalnum() or c in '-_' else '_' for c in user_id)
-        return self.progress_dir / f"{safe_user_id}.json"
+        return self.progress_dir / f"{_UNSAFE_ID_RE.sub('_', user_id)}.json"
     
-    def _load_user_progress(self, user_id: str) -> Dict:
-        """Load user's progress from file"""
-        user_file = self._get_user_file(user_id)
+    def _read_rows(self, user_id: str) -> Optional[Dict[Tuple, Tuple]]:
+        """Read a user's rows from the database (caller holds the lock)"""
+        user = self._conn.execute(
+            "SELECT created_at, last_active, stats_json FROM users WHERE user_id=?", (user_id,)
+        ).fetchone()
+        if user is None:
+            return None
         
-        if not user_file.exists():
-            # Create new progress file
+        rows = {_USER_ROW: tuple(user)}
+        for lesson_key, data_json in self._conn.execute(
+                "SELECT lesson_key, data_json FROM lesson_progress WHERE user_id=? ORDER BY rowid", (user_id,)):
+            rows[('lesson', sys.intern(lesson_key))] = (data_json,)
+        for lesson_key, question_id, data_json in self._conn.execute(
+                "SELECT lesson_key, question_id, data_json FROM question_answers WHERE user_id=? ORDER BY rowid", (user_id,)):
+            rows[('question', sys.intern(lesson_key), sys.intern(question_id))] = (data_json,)
+        return rows
+    
+    def _read_legacy_file(self, user_id: str) -> Optional[Dict]:
+        """Parse a user's progress file from before the database, if there is one"""
+        user_file = self._get_user_file(user_id)
+        if user_file.name not in self._known_files:
+            return None
+        try:
+            with open(user_file, 'rb') as f:
+                return _loads(f.read())
+        except FileNotFoundError:  # Deleted behind our back
+            self._known_files.discard(user_file.name)
+            return None
+    
+    def _load_user_progress(self, user_id: str) -> Dict:
+        """Load user's progress (from memory if a write is pending, else from the database)"""
+        with self._lock:
+            rows = self._rows.get(user_id)
+            if rows is None:
+                rows = self._read_rows(user_id)
+                if rows is None:
+                    legacy = self._read_legacy_file(user_id)
+                    if legacy is not None:
+                        # Import into the database on the next flush; the file is left as a backup
+                        self._store_rows(user_id, _split_progress(legacy))
+                        return legacy
+        
+        if rows is None:
+            # New user - only cached once something is saved
+            now = _iso_now()
             return {
                 "user_id": user_id,
-                "created_at": datetime.now().isoformat(),
-                "last_active": datetime.now().isoformat(),
+                "created_at": now,
+                "last_active": now,
                 "lessons": {},  # lesson_id -> lesson progress
                 "stats": {
                     "total_lessons_started": 0,
@@ -46,21 +238,55 @@ class ProgressTracker:
                 }
             }
         
-        with open(user_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return _join_progress(user_id, rows)
     
-    def _save_user_progress(self, user_id: str, progress: Dict):
-        """Save user's progress to file"""
-        progress["last_active"] = datetime.now().isoformat()
-        user_file = self._get_user_file(user_id)
-        
-        with open(user_file, 'w', encoding='utf-8') as f:
-            json.dump(progress, f, indent=2, ensure_ascii=False)
+    def _store_rows(self, user_id: str, rows: Dict[Tuple, Tuple]):
+        """Make rows the user's latest state and schedule a flush (caller holds the lock)"""
+        self._rows[user_id] = rows
+        self._dirty.add(user_id)
+        if user_id not in self._timers:
+            timer = threading.Timer(self.flush_delay, self._flush, args=(user_id,))
+            timer.daemon = True
+            self._timers[user_id] = timer
+            timer.start()
     
-    def start_lesson(self, user_id: str, grade: str, subject: str, lesson_id: str):
-        """Mark a lesson as started"""
-        progress = self._load_user_progress(user_id)
+    def _save_user_progress(self, user_id: str, progress: Dict, now: Optional[str] = None):
+        """Save user's progress in memory and schedule the database write (now: ISO timestamp of the change)"""
+        progress["last_active"] = now or _iso_now()
+        rows = _split_progress(progress)
         
+        with self._lock:
+            self._store_rows(user_id, rows)
+    
+    def _flush(self, user_id: str):
+        """Write a user's changed rows to the database in one transaction"""
+        with self._lock:
+            timer = self._timers.pop(user_id, None)
+            if timer is not None:
+                timer.cancel()
+            if user_id not in self._dirty:
+                return
+            self._dirty.discard(user_id)
+            
+            # Diff against what's in the database, so clean users needn't stay cached
+            rows = self._rows.pop(user_id)
+            written = self._read_rows(user_id) or {}
+            with self._conn:
+                for key, values in rows.items():
+                    if written.get(key) != values:
+                        self._conn.execute(_ROW_SQL[key[0]][0], (user_id, *key[1:], *values))
+                for key in written.keys() - rows.keys():
+                    self._conn.execute(_ROW_SQL[key[0]][1], (user_id, *key[1:]))
+    
+    def flush_all(self):
+        """Write all pending progress to the database (runs at exit)"""
+        with self._lock:
+            pending = list(self._dirty)
+        for user_id in pending:
+            self._flush(user_id)
+    
+    def _ensure_lesson(self, progress: Dict, grade: str, subject: str, lesson_id: str, now: str) -> Dict:
+        """Return the lesson's progress, adding a started entry to loaded progress if missing (no I/O)"""
         lesson_key = f"{grade}/{subject}/{lesson_id}"
         
         if lesson_key not in progress["lessons"]:
@@ -69,53 +295,59 @@ class ProgressTracker:
                 "subject": subject,
                 "lesson_id": lesson_id,
                 "status": "in_progress",
-                "started_at": datetime.now().isoformat(),
+                "started_at": now,
                 "completed_at": None,
                 "current_section": None,
                 "sections_completed": [],
                 "questions_answered": {},  # question_id -> {correct, attempts, hints_used}
                 "total_score": 0,
                 "total_questions": 0,
+                "question_count": 0,  # Running counts of questions_answered, kept by _apply_answer
+                "correct_count": 0,
                 "time_spent_minutes": 0
             }
             progress["stats"]["total_lessons_started"] += 1
         
-        self._save_user_progress(user_id, progress)
         return progress["lessons"][lesson_key]
     
+    def start_lesson(self, user_id: str, grade: str, subject: str, lesson_id: str):
+        """Mark a lesson as started"""
+        now = _iso_now()
+        progress = self._load_user_progress(user_id)
+        lesson_progress = self._ensure_lesson(progress, grade, subject, lesson_id, now)
+        
+        self._save_user_progress(user_id, progress, now)
+        return lesson_progress
+    
     def update_section_progress(self, user_id: str, grade: str, subject: str, 
                                 lesson_id: str, section_id: str, status: str = "in_progress"):
         """Update progress for a section"""
+        now = _iso_now()
         progress = self._load_user_progress(user_id)
-        lesson_key = f"{grade}/{subject}/{lesson_id}"
-        
-        if lesson_key not in progress["lessons"]:
-            self.start_lesson(user_id, grade, subject, lesson_id)
-            progress = self._load_user_progress(user_id)
-        
-        lesson_progress = progress["lessons"][lesson_key]
+        lesson_progress = self._ensure_lesson(progress, grade, subject, lesson_id, now)
         lesson_progress["current_section"] = section_id
         
         if status == "completed" and section_id not in lesson_progress["sections_completed"]:
             lesson_progress["sections_completed"].append(section_id)
             progress["stats"]["total_sections_completed"] += 1
         
-        self._save_user_progress(user_id, progress)
+        self._save_user_progress(user_id, progress, now)
         return lesson_progress
     
-    def record_answer(self, user_id: str, grade: str, subject: str, lesson_id: str,
-                     question_id: str, is_correct: bool, hints_used: int = 0):
-        """Record a question answer"""
-        progress = self._load_user_progress(user_id)
-        lesson_key = f"{grade}/{subject}/{lesson_id}"
-        
-        if lesson_key not in progress["lessons"]:
-            self.start_lesson(user_id, grade, subject, lesson_id)
-            progress = self._load_user_progress(user_id)
-        
-        lesson_progress = progress["lessons"][lesson_key]
-        
+    @staticmethod
+    def _ensure_answer_counts(lesson_progress: Dict):
+        """Backfill running answer counts for lessons saved before they were tracked"""
+        if "question_count" not in lesson_progress:
+            answered = lesson_progress["questions_answered"].values()
+            lesson_progress["question_count"] = len(answered)
+            lesson_progress["correct_count"] = sum(1 for q in answered if q["correct"])
+    
+    def _apply_answer(self, progress: Dict, lesson_progress: Dict, question_id: str,
+                      is_correct: bool, hints_used: int, now: str) -> Dict:
+        """Apply one answer to loaded progress (caller saves)"""
+        self._ensure_answer_counts(lesson_progress)
         if question_id not in lesson_progress["questions_answered"]:
+            lesson_progress["question_count"] += 1
             lesson_progress["questions_answered"][question_id] = {
                 "correct": False,
                 "attempts": 0,
@@ -130,21 +362,59 @@ class ProgressTracker:
         
         if is_correct and not question_progress["correct"]:
             question_progress["correct"] = True
-            question_progress["answered_at"] = datetime.now().isoformat()
+            question_progress["answered_at"] = now
             
             if question_progress["attempts"] == 1 and hints_used == 0:
                 question_progress["first_attempt_correct"] = True
             
             # Update stats
+            lesson_progress["correct_count"] += 1
             progress["stats"]["total_questions_correct"] += 1
         
         progress["stats"]["total_questions_answered"] += 1
+        return question_progress
+    
+    def record_answer(self, user_id: str, grade: str, subject: str, lesson_id: str,
+                     question_id: str, is_correct: bool, hints_used: int = 0):
+        """Record a question answer"""
+        now = _iso_now()
+        progress = self._load_user_progress(user_id)
+        lesson_progress = self._ensure_lesson(progress, grade, subject, lesson_id, now)
+        
+        question_progress = self._apply_answer(progress, lesson_progress, question_id, is_correct, hints_used, now)
         
-        self._save_user_progress(user_id, progress)
+        self._save_user_progress(user_id, progress, now)
         return question_progress
     
+    def record_answers(self, user_id: str, grade: str, subject: str, lesson_id: str,
+                       answers: List[Dict]) -> Dict:
+        """
+        Record several answers for one lesson, in order, with a single load/save.
+        
+        Args:
+            answers: Dicts with question_id, is_correct and optional hints_used
+        
+        Returns:
+            question_id -> question progress after all answers were applied
+        """
+        now = _iso_now()
+        progress = self._load_user_progress(user_id)
+        lesson_progress = self._ensure_lesson(progress, grade, subject, lesson_id, now)
+        
+        results = {}
+        for answer in answers:
+            question_id = answer["question_id"]
+            results[question_id] = self._apply_answer(
+                progress, lesson_progress, question_id,
+                answer.get("is_correct", False), answer.get("hints_used", 0), now
+            )
+        
+        self._save_user_progress(user_id, progress, now)
+        return results
+    
     def complete_lesson(self, user_id: str, grade: str, subject: str, lesson_id: str):
         """Mark a lesson as completed"""
+        now = _iso_now()
         progress = self._load_user_progress(user_id)
         lesson_key = f"{grade}/{subject}/{lesson_id}"
         
@@ -155,18 +425,20 @@ class ProgressTracker:
         
         if lesson_progress["status"] != "completed":
             lesson_progress["status"] = "completed"
-            lesson_progress["completed_at"] = datetime.now().isoformat()
+            lesson_progress["completed_at"] = now
             
             # Calculate score
-            total_questions = len(lesson_progress["questions_answered"])
-            correct_questions = sum(1 for q in lesson_progress["questions_answered"].values() if q["correct"])
+            self._ensure_answer_counts(lesson_progress)
+            total_questions = lesson_progress["question_count"]
+            correct_questions = lesson_progress["correct_count"]
             
             lesson_progress["total_questions"] = total_questions
             lesson_progress["total_score"] = round((correct_questions / total_questions * 100) if total_questions > 0 else 0, 1)
             
             progress["stats"]["total_lessons_completed"] += 1
         
-        self._save_user_progress(user_id, progress)
+        self._save_user_progress(user_id, progress, now)
+        self._flush(user_id)  # Don't leave a completed lesson waiting on the timer
         return lesson_progress
     
     def get_lesson_progress(self, user_id: str, grade: str, subject: str, lesson_id: str) -> Optional[Dict]:
@@ -266,12 +538,26 @@ class ProgressTracker:
     
     def delete_user_progress(self, user_id: str):
         """Delete all progress for a user"""
+        with self._lock:
+            cached = self._rows.pop(user_id, None)
+            self._dirty.discard(user_id)
+            timer = self._timers.pop(user_id, None)
+            if timer is not None:
+                timer.cancel()
+            
+            with self._conn:
+                deleted = self._conn.execute(_ROW_SQL['user'][1], (user_id,)).rowcount
+                self._conn.execute("DELETE FROM lesson_progress WHERE user_id=?", (user_id,))
+                self._conn.execute("DELETE FROM question_answers WHERE user_id=?", (user_id,))
+        
         user_file = self._get_user_file(user_id)
-        if user_file.exists():
+        self._known_files.discard(user_file.name)
+        try:
             user_file.unlink()
-            return True
-        return False
-
+            deleted = True
+        except FileNotFoundError:
+            pass
+        return bool(deleted) or cached is not None
 
 # Global instance
 progress_tracker = ProgressTracker()